@@ -3,448 +3,21 @@ import sys
 import random
 import time
 import os.path
-import numpy as np
-import pandas as pd
+import multiprocessing
 import PyQt5.sip
-from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtCore import QSize, Qt, QThread, pyqtSignal
 from PyQt5.QtWidgets import (QApplication, QPushButton, QFileDialog, QAction, \
                              QMainWindow, QMessageBox, QDesktopWidget, QStyle, \
-                             QMenu,)
+                             QMenu, QProgressDialog,)
 from PyQt5.QtGui import QIcon, QImage, QPalette, QBrush
 
-
-class Record(object):
-    def __init__(self, data, idx_):
-        """constructor for Record class.
-        Inputs:
-            data: related info for Record object, in the form of tuple,
-                  data = (lvl, itm, des, qty, ref, seq).
-            idx_: the index of this record.
-        """
-        super().__init__()
-        assert(len(data)==7), "Illegal Constructor Inputs!"
-        self.idx = idx_
-        self.lvl = data[0]
-        self.itm = data[1]
-        self.des = data[2]
-        self.qty = data[3]
-        self.ref = data[4]
-        self.seq = data[5]
-        self.nme = data[6]
-        self.children = None
-        self.match = None
-
-
-    def find_children(self, data):
-        """find index for Record's children.
-        Input:
-            data: list of lvl.
-        """
-        i = 1
-        while (self.idx+i<len(data)) and (data[self.idx+i] > self.lvl):
-            i = i+1
-        if i>1:
-            temp = data[self.idx+1:self.idx+i]
-            self.children = \
-            [(x+self.idx+1)for x,val in enumerate(temp) if val==(self.lvl+1)]
-
-
-def get_index(f, simple):
-    """get the index of starting rows.
-    Inputs:
-        f: pandas Series object.
-        simple: flag for simple BOMs. True means processing simple BOMs.
-    Outputs:
-        idx: start(, end) index of BOM.
-    """
-    # get index of row "BOM"
-    line = f[f.columns[0]]
-    end = 0
-
-    if simple:
-        start = -1
-    else:
-        start = 0
-        while line[start]!="BOM":
-            start = start+1
-
-    # get index of row "Manufacturers"
-    if "Manufacturers" in list(line):
-        end = start+1
-        while line[end]!="Manufacturers":
-            end = end+1
-
-    if end is not 0:
-        return start, end
-    return (start,)
-
-
-def get_info(f, idx, simple):
-    """get useful info.
-    Inputs:
-        f: pandas Series object.
-        idx: start(, end) index of BOM.
-        simple: flag of BOM types.
-    Outputs:
-        lvl: numpy array of Level.
-        itm: numpy array of Item Number.
-        des: numpy array of Item Description.
-        qty: numpy array of Qty.
-        ref: numpy array of Ref Des.
-        seq: numpy array of Item Sequence.
-        nme: numpy array of Item Series.
-    """
-    itm = None
-    des = None
-    qty = None
-    ref = None
-    seq = None
-    lvl = None
-    idx1 = idx[0]
-
-    if len(idx) is 2:
-        idx2 = idx[1]
-    else:
-        idx2 = 0
-
-    # catch useful data, start from row "BOM",
-    # (if necessary,) end at row "Manufacturers"
-    # simple BOM fits in a differnet structure
-    if simple:
-        for j in range(0, len(f.columns)):
-            if (lvl is None)&(f.columns[j] == "Level"):
-                lvl = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (itm is None)&(f.columns[j] == "Number"):
-                itm = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (des is None)&(f.columns[j] == "Description"):
-                des = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (qty is None)&(f.columns[j] == "BOM.Qty"):
-                qty = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (ref is None)&(f.columns[j] == "BOM.Ref Des"):
-                ref = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (seq is None)&(f.columns[j] == "BOM.Item Seq"):
-                seq = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-            if (lvl is not None)&(itm is not None)&(des is not None)& \
-                    (qty is not None)&(ref is not None)&(seq is not None):
-                break
-    else:
-        for j in range(0, len(f.columns)):
-            if (lvl is None)&(f[f.columns[j]][idx1+1] == "Level"):
-                lvl = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (itm is None)&(f[f.columns[j]][idx1+1] == "Item Number"):
-                itm = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (des is None)&(f[f.columns[j]][idx1+1] == "Item Description"):
-                des = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (qty is None)&(f[f.columns[j]][idx1+1] == "Qty"):
-                qty = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (ref is None)&(f[f.columns[j]][idx1+1] == "Ref Des"):
-                ref = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-                continue
-            if (seq is None)&(f[f.columns[j]][idx1+1] == "Item Seq"):
-                seq = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
-            if (lvl is not None)&(itm is not None)&(des is not None)& \
-                    (qty is not None)&(ref is not None)&(seq is not None):
-                break
-
-    # omit blank rows, and set data type
-    valid = []
-    for i in range(0, len(itm)):
-        if type(itm[i]) is str:
-            valid.append(i)
-    lvl = lvl[valid].astype("int")
-    itm = itm[valid]
-    des = des[valid]
-    qty = qty[valid].astype("float")
-    ref = ref[valid]
-    seq = seq[valid].astype("int")
-
-    for i,unit in enumerate(ref):
-        if unit is np.nan:
-            ref[i] = ""
-
-    # split version number from item number
-    nme = []
-    for unit in itm:
-        temp = unit.split("-")
-        if len(temp)<3:
-            nme.append(unit)
-        else:
-            nme.append(temp[0]+"-"+temp[1])
-    nme = np.asarray(nme)
-
-    return lvl, itm, des, qty, ref, seq, nme
-
-
-def get_ancester(data1, data2):
-    """
-    Inputs:
-        data1: numpy array of Record object.
-        data2: numpy array of Record object.
-    Outputs:
-        ancester1: list of level 1 Record in data1.
-        ancester2: list of level 1 Record in data2.
-    """
-    ancester1 = []
-    ancester2 = []
-
-    for i, unit in enumerate(data1):
-        if unit.lvl == 1:
-            ancester1.append(i)
-
-    for i, unit in enumerate(data2):
-        if unit.lvl == 1:
-            ancester2.append(i)
-
-    return ancester1, ancester2
-
-
-def match(record1, record2):
-    """find the item matched in BOM2 for item in BOM1.
-    Inputs:
-        record1: numpy array of Record in BOM 1.
-        record2: numpy array of Record in BOM 2.
-    Matching Rules:
-        0. match code: 1, this Record belongs to record1, no Record matched it
-                          in record2.
-                       -1, this Record belongs to record2, no Record matched it
-                          in record1.
-                      integer, this Record belongs to record1, the integer
-                               represents the index of matched Record in
-                               record2.
-        1. match the Item accroding to Item Series.
-        2. if duplicates exist, match the Item according to Item Number.
-    """
-
-    # special cases
-    if record1 is None:
-        for unit in record2:
-            unit.match = 1
-        return
-    if record2 is None:
-        for unit in record1:
-            unit.match = -1
-        return
-
-    # create list for item series
-    pool1 = []
-    pool2 = []
-    origin_pool1 = []
-    origin_pool2 = []
-    for unit in record1:
-        origin_pool1.append(unit.itm)
-        pool1.append(unit.nme)
-    pool1 = np.asarray(pool1)
-    origin_pool1 = np.asarray(origin_pool1)
-    for unit in record2:
-        origin_pool2.append(unit.itm)
-        pool2.append(unit.nme)
-    pool2 = np.asarray(pool2)
-    origin_pool2 = np.asarray(origin_pool2)
-
-    # find matched items
-    for unit in record1:
-        if unit.nme in pool2:
-            unit.match = np.where((pool2==unit.nme).astype("int")==1)
-        else:
-            unit.match = -1
-
-    for unit in record2:
-        if unit.nme not in pool1:
-            unit.match = 1
-
-    # find duplicates
-    uni,i = np.unique(pool1, return_inverse = True)
-    dup1 = uni[np.bincount(i)>1]
-
-    uni,i = np.unique(pool2, return_inverse = True)
-    dup2 = uni[np.bincount(i)>1]
-
-    # rematch for duplicates
-    for unit in record1:
-        if (unit.nme in dup1) or (unit.nme in dup2):
-            if unit.itm in origin_pool2:
-                unit.match = np.where((origin_pool2==unit.itm).astype("int")==1)
-            else:
-                unit.match = -1
-
-    for unit in record2:
-        if (unit.nme in dup2) or (unit.nme in dup1):
-            if unit.itm in origin_pool1:
-                unit.match = None
-            else:
-                unit.match = 1
-
-
-def get_compare(record1, record2, data1, data2, input):
-    """comparison recursively.
-    Inputs:
-        record1: Record family1.
-        record2: Record family2.
-        data1: list of all data in BOM1.
-        data2: list of all data in BOM2.
-        input: dict to store the comparison result. format:
-               {lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2}
-    Output:
-        output: dict to store the comparison result. same format with input.
-    """
-    match(record1, record2)
-    (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2) = input
-
-    # special case
-    if record2 is not None:
-        for unit in record2:
-            if unit.match is 1:
-                lvl = np.append(lvl, unit.lvl)
-                itm2 = np.append(itm2, unit.itm)
-                itm1 = np.append(itm1, None)
-                qty2 = np.append(qty2, unit.qty)
-                qty1 = np.append(qty1, 0)
-                des2 = np.append(des2, unit.des)
-                des1 = np.append(des1, None)
-                ref2 = np.append(ref2, unit.ref)
-                ref1 = np.append(ref1, None)
-                seq2 = np.append(seq2, unit.seq)
-                seq1 = np.append(seq1, None)
-                if unit.children is None:
-                    continue
-                temp = (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2)
-                (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2) = \
-                    get_compare(None, data2[unit.children], data1, data2, temp)
-
-    if record1 is not None:
-        for unit in record1:
-            if unit.match is -1:
-                lvl = np.append(lvl, unit.lvl)
-                itm1 = np.append(itm1, unit.itm)
-                itm2 = np.append(itm2, None)
-                qty1 = np.append(qty1, unit.qty)
-                qty2 = np.append(qty2, 0)
-                des1 = np.append(des1, unit.des)
-                des2 = np.append(des2, None)
-                ref1 = np.append(ref1, unit.ref)
-                ref2 = np.append(ref2, None)
-                seq1 = np.append(seq1, unit.seq)
-                seq2 = np.append(seq2, None)
-                if unit.children is None:
-                     continue
-                temp = (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2)
-                (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2) = \
-                    get_compare(data1[unit.children], None, data1, data2, temp)
-
-            elif unit.match is not None:
-                if (unit.itm != record2[unit.match][0].itm) or \
-                    (unit.qty != record2[unit.match][0].qty) or \
-                    (unit.ref != record2[unit.match][0].ref):
-                    lvl = np.append(lvl, unit.lvl)
-                    itm1 = np.append(itm1, unit.itm)
-                    itm2 = np.append(itm2, record2[unit.match][0].itm)
-                    qty1 = np.append(qty1, unit.qty)
-                    qty2 = np.append(qty2, record2[unit.match][0].qty)
-                    des1 = np.append(des1, unit.des)
-                    des2 = np.append(des2, record2[unit.match][0].des)
-                    ref1 = np.append(ref1, unit.ref)
-                    ref2 = np.append(ref2, record2[unit.match][0].ref)
-                    seq1 = np.append(seq1, unit.seq)
-                    seq2 = np.append(seq2, record2[unit.match][0].seq)
-                    temp=(lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2)
-
-                    if (unit.children is None) and \
-                            (record2[unit.match][0].children is None):
-                        continue
-
-                    if (unit.children is None) and \
-                            (record2[unit.match][0].children is not None):
-                        (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1, \
-                        seq2)=get_compare(None, \
-                        data2[record2[unit.match][0].children], \
-                        data1, data2, temp)
-                        continue
-
-                    if (unit.children is not None) and \
-                            (record2[unit.match][0].children is None):
-                        (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1, \
-                        seq2)=get_compare(data1[unit.children], None, \
-                        data1, data2, temp)
-                        continue
-
-                    if (unit.children is not None) and \
-                            (record2[unit.match][0].children is not None):
-                        (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1, \
-                        seq2)=get_compare(data1[unit.children], \
-                        data2[record2[unit.match][0].children],data1,data2,temp)
-                        continue
-
-    return (lvl,itm1,itm2,qty1,qty2,des1,des2,ref1,ref2,seq1,seq2)
-
-
-def main(path1, path2, simple, file_name=None):
-    """generate comparison results.
-    Inputs:
-        path1: string, path of old BOM.
-        path2: string, path of new BOM.
-        simple: flag for BOM format. True for simple, False for standard.
-        file_name: string, name of the file to be generated.
-    """
-    # set output file name
-    if file_name is None:
-        file_name = os.path.splitext(os.path.basename(path1))[0] + "_" + \
-                    os.path.splitext(os.path.basename(path2))[0] + "_cmp.xlsx"
-
-    # import excel file
-    f1 = pd.read_excel(path1)
-    f2 = pd.read_excel(path2)
-
-    # capture BOM content from file
-    idx1 = get_index(f1, simple)
-    idx2 = get_index(f2, simple)
-
-    # store related content in numpy arrays
-    args1 = get_info(f1, idx1, simple)
-    args2 = get_info(f2, idx2, simple)
-
-    # construct numpy array of Record object.
-    array1 = np.vstack(args1).transpose()
-    array2 = np.vstack(args2).transpose()
-    data1 = np.asarray([Record(unit, i) for i, unit in enumerate(array1)])
-    data2 = np.asarray([Record(unit, i) for i, unit in enumerate(array2)])
-
-    # find children for all Records
-    for item in data1:
-        item.find_children(args1[0])
-
-    for item in data2:
-        item.find_children(args2[0])
-
-    # compare recursively
-    ancester1, ancester2 = get_ancester(data1, data2)
-    input = (np.array([]), np.array([]), np.array([]), np.array([]), \
-             np.array([]), np.array([]), np.array([]), np.array([]), \
-             np.array([]), np.array([]), np.array([]))
-    (Level,Itm1,Itm2,Qty1,Qty2,Des1,Des2,Ref1,Ref2,Seq1,Seq2) = \
-        get_compare(data1[ancester1], data2[ancester2], data1, data2, input)
-
-    # store comparison result in excel file
-    data = np.vstack((Level, Itm1, Itm2, Qty1, Qty2, Des1, Des2, Ref1, Ref2, \
-                  Seq1, Seq2)).transpose()
-    column = ["Level", "Original Item", "Updated Item", \
-              "Original Qty.", "Updated Qty.", "Original Item Des.", \
-              "Updated Item Des.", "Original Ref. Des.", \
-              "Updated Ref. Des.", "Original Seq.", \
-              "Updated Seq."]
-    dic = pd.DataFrame.from_records(data)
-    writer = pd.ExcelWriter(file_name)
-    dic.to_excel(writer, sheet_name = "Comparison Report", index=False, \
-                        header = column)
-    writer.save()
+# the comparison engine is the shared bomcomparer package one folder up,
+# PyInstaller finds it through --paths
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), \
+                                os.pardir))
+from bomcomparer import BOMCache, Cancelled, CompareMemo, TableMemo, main, \
+                        reset_vocabulary
+from bomcomparer.batch import batch_cli
 
 
 def resource_path(relative_path):
@@ -453,6 +26,79 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
+class LoadWorker(QThread):
+    """read and prepare a BOM into a TableMemo as soon as it is picked."""
+
+    def __init__(self, path, simple, cache, tables):
+        super().__init__()
+        self.path = path
+        self.simple = simple
+        self.cache = cache
+        self.tables = tables
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    # called by TableMemo.load in the worker thread
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
+
+    def run(self):
+        try:
+            self.tables.load(self.path, self.simple, self.cache, self.check)
+        except Exception:
+            # a BOM that fails here is read again by the comparison, which
+            # reports the error
+            return
+
+
+class CompareWorker(QThread):
+    """run main() away from the GUI thread, reporting through signals."""
+    progress = pyqtSignal(str, int, int)
+    succeeded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path1, path2, simple, file_name, cache, memo, \
+                 tables, loaders):
+        super().__init__()
+        self.path1 = path1
+        self.path2 = path2
+        self.simple = simple
+        self.file_name = file_name
+        self.cache = cache
+        self.memo = memo
+        self.tables = tables
+        self.loaders = loaders
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    # progress callback of main, runs in the worker thread
+    def report(self, stage, rows, percent):
+        if self.cancelled and (stage != "Done"):
+            raise Cancelled()
+        self.progress.emit(stage, rows, percent)
+
+    def run(self):
+        try:
+            # let BOMs still being read in the background finish first
+            self.report("Loading BOMs", 0, 0)
+            for loader in self.loaders:
+                loader.wait()
+            main(self.path1, self.path2, self.simple, self.file_name, \
+                 cache=self.cache, progress=self.report, memo=self.memo, \
+                 tables=self.tables)
+        except Cancelled:
+            return
+        except Exception as error:
+            self.failed.emit(repr(error))
+            return
+        self.succeeded.emit(self.file_name)
+
+
 class Window(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -461,6 +107,17 @@ class Window(QMainWindow):
         self.file_name = None
         self.simple = True
         self.folder_path = ""
+        self.cache = BOMCache()
+        # rows of the last comparison, re-comparing skips unchanged subtrees
+        self.memo = CompareMemo()
+        # BOMs read as soon as they are picked, and the threads reading them
+        self.tables = TableMemo()
+        self.loaders = [None, None]
+        self.stale = []
+        self.worker = None
+        self.progressBox = None
+        # path of the last report written, kept in the statusbar
+        self.generated = None
         self.blue_box = "color: white; font: 10pt Arial; \
                           font-weight: bold; background-color: rgb(5,188,228);"
         self.green_box = "color: white; font: 10pt Arial; \
@@ -538,11 +195,16 @@ class Window(QMainWindow):
         setBStandard.setStatusTip("To Process Standard BOMs")
         setB.addAction(setBSimple)
         setB.addAction(setBStandard)
+        # add menu option "Clear Cache"
+        clearC = QAction("&Clear Cache", self)
+        clearC.setStatusTip("Forget BOMs Parsed by Earlier Comparisons")
+        clearC.triggered.connect(self.clearCache)
         # add Setting menu
         menubar = self.menuBar()
         settingMenu = menubar.addMenu("&Setting ")
         settingMenu.addAction(setF)
         settingMenu.addMenu(setB)
+        settingMenu.addAction(clearC)
 
         # add menu option "Read Me"
         readMe = QAction("&Read Me", self)
@@ -599,6 +261,7 @@ class Window(QMainWindow):
     def showImport1(self):
         fname = QFileDialog.getOpenFileName(self, "Open", "\home")
         self.file1 = str(fname[0])
+        self.preload(0, self.file1)
         self.statusBar().showMessage("Original BOM Imported: "+ \
                             os.path.basename(self.file1))
 
@@ -606,11 +269,27 @@ class Window(QMainWindow):
     def showImport2(self):
         fname = QFileDialog.getOpenFileName(self, "Open", "\home")
         self.file2 = str(fname[0])
+        self.preload(1, self.file2)
         self.statusBar().showMessage("Updated BOM Imported: "+ \
                             os.path.basename(self.file2))
 
+    # read BOM i in the background, dropping the one picked before it
+    def preload(self, i, path):
+        if self.loaders[i] is not None:
+            self.loaders[i].cancel()
+            self.stale.append(self.loaders[i])
+            self.loaders[i] = None
+        # threads are kept referenced until they stop
+        self.stale = [x for x in self.stale if x.isRunning()]
+        if (path is not None) and os.path.isfile(path):
+            self.loaders[i] = LoadWorker(path, self.simple, self.cache, \
+                                         self.tables)
+            self.loaders[i].start()
+
 
     def onClickCompare(self):
+        if (self.worker is not None) and self.worker.isRunning():
+            return
         string1 = os.path.splitext(os.path.basename(self.file1))[0]
         string2 = os.path.splitext(os.path.basename(self.file2))[0]
         timetag = time.strftime("%Y-%m-%d@%H-%M-%S",time.localtime())
@@ -619,10 +298,75 @@ class Window(QMainWindow):
         if self.folder_path is "":
             self.folder_path = os.path.join(os.path.expanduser("~"),"Desktop")
         self.file_name = os.path.join(self.folder_path, base)
+        self.generated = None
         self.statusBar().showMessage("Processing...")
-        main(self.file1, self.file2, self.simple, self.file_name)
-        self.statusBar().showMessage("File Generated: "+ \
-                                os.path.join(self.folder_path, self.file_name))
+
+        # compare on a worker thread, keeping the window responsive
+        self.progressBox = QProgressDialog("Processing...", "Cancel", 0, 100, \
+                                           self)
+        self.progressBox.setWindowTitle("Comparing BOMs")
+        self.progressBox.setWindowModality(Qt.WindowModal)
+        self.progressBox.setMinimumDuration(0)
+        self.progressBox.canceled.connect(self.cancelCompare)
+        loaders = [x for x in self.loaders if x is not None]
+        self.worker = CompareWorker(self.file1, self.file2, self.simple, \
+                                    self.file_name, self.cache, self.memo, \
+                                    self.tables, loaders)
+        self.worker.progress.connect(self.showProgress)
+        self.worker.succeeded.connect(self.showGenerated)
+        self.worker.failed.connect(self.showFailure)
+        self.worker.finished.connect(self.finishCompare)
+        self.worker.start()
+
+    # update progress dialog and statusbar while comparing. setValue of the
+    # modal dialog handles pending events, showGenerated among them, so the
+    # statusbar is updated first, and not at all for the last stage
+    def showProgress(self, stage, rows, percent):
+        if stage != "Done":
+            self.statusBar().showMessage(stage + "... " + str(percent) + "%")
+        self.progressBox.setLabelText(stage + ": " + str(rows) + " rows")
+        self.progressBox.setValue(percent)
+
+    def showGenerated(self, file_name):
+        self.generated = os.path.join(self.folder_path, file_name)
+        self.statusBar().showMessage("File Generated: " + self.generated)
+
+    def showFailure(self, message):
+        self.statusBar().showMessage("Comparison Failed")
+        failure = QMessageBox()
+        failure.setWindowIcon(self.style().standardIcon(getattr(QStyle, \
+                            "SP_ComputerIcon")))
+        failure.setWindowTitle("Attention")
+        if random.randint(1,2)==1:
+            failure.setStyleSheet(self.green_box)
+        else:
+            failure.setStyleSheet(self.blue_box)
+        failure.setText("Fail to compare BOMs!\n" + message)
+        failure.exec_()
+
+    def cancelCompare(self):
+        if (self.worker is not None) and self.worker.isRunning():
+            self.worker.cancel()
+            self.statusBar().showMessage("Cancelling...")
+
+    def finishCompare(self):
+        self.progressBox.canceled.disconnect(self.cancelCompare)
+        self.progressBox.reset()
+        if self.worker.cancelled:
+            self.statusBar().showMessage("Comparison Cancelled")
+        elif self.generated is not None:
+            self.statusBar().showMessage("File Generated: " + self.generated)
+
+    # wait for a running comparison to stop before closing
+    def closeEvent(self, event):
+        if (self.worker is not None) and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        for loader in self.stale + self.loaders:
+            if loader is not None:
+                loader.cancel()
+                loader.wait()
+        event.accept()
 
 
     def rUSure(self):
@@ -735,15 +479,42 @@ class Window(QMainWindow):
         self.folder_path = str(path)
         self.statusBar().showMessage("Set Folder as: "+path)
 
+    # clear cache of parsed BOMs, and free the strings of every BOM read so
+    # far. A running comparison still uses them, so they are kept until it
+    # is done, and BOMs being read are dropped and read again afterwards
+    def clearCache(self):
+        if (self.worker is not None) and self.worker.isRunning():
+            self.statusBar().showMessage("Comparison Running, Cache Kept")
+            return
+        for loader in self.stale + self.loaders:
+            if loader is not None:
+                loader.cancel()
+                loader.wait()
+        self.stale = []
+        self.loaders = [None, None]
+        self.cache.clear()
+        self.memo.clear()
+        self.tables.clear()
+        reset_vocabulary()
+        self.preload(0, self.file1)
+        self.preload(1, self.file2)
+        self.statusBar().showMessage("Cache Cleared")
+
     # set BOM Types
     def setBOMSimple(self):
         pass
 
     def setBOMStandard(self):
         self.simple = False
+        # BOMs read in the background were read as the other type
+        self.preload(0, self.file1)
+        self.preload(1, self.file2)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    if "--batch" in sys.argv[1:]:
+        sys.exit(batch_cli(sys.argv[1:]))
     app = QApplication(sys.argv)
     window = Window()
     sys.exit(app.exec_())
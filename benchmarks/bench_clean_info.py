@@ -0,0 +1,92 @@
+"""Micro-benchmark of clean_info against the former per-row loops.
+
+Run from the repository root:
+    python benchmarks/bench_clean_info.py
+Both versions get the same 100k rows, with blank rows, missing Ref Des and
+item numbers with and without version suffix, and must give equal results.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), \
+                                os.pardir))
+from bomcomparer import clean_info
+
+
+def clean_info_loops(lvl, itm, des, qty, ref, seq):
+    """clean_info as it was written with python loops."""
+    valid = []
+    for i in range(0, len(itm)):
+        if type(itm[i]) is str:
+            valid.append(i)
+    lvl = lvl[valid].astype("int")
+    itm = itm[valid]
+    des = des[valid]
+    qty = qty[valid].astype("float")
+    ref = ref[valid]
+    seq = seq[valid].astype("int")
+
+    for i,unit in enumerate(ref):
+        if (unit is None) or (unit is np.nan):
+            ref[i] = ""
+
+    nme = []
+    for unit in itm:
+        temp = unit.split("-")
+        if len(temp)<3:
+            nme.append(unit)
+        else:
+            nme.append(temp[0]+"-"+temp[1])
+    nme = np.asarray(nme)
+
+    return lvl, itm, des, qty, ref, seq, nme
+
+
+def build(n):
+    """build n raw BOM rows as they come out of the excel file."""
+    rng = np.random.RandomState(0)
+    lvl = np.empty(n, dtype="object")
+    itm = np.empty(n, dtype="object")
+    des = np.empty(n, dtype="object")
+    ref = np.empty(n, dtype="object")
+    for i in range(n):
+        if i % 50 == 49:
+            itm[i] = np.nan
+            lvl[i] = np.nan
+            continue
+        lvl[i] = rng.randint(1, 6)
+        if i % 7 == 0:
+            itm[i] = "PART%d" % i
+        else:
+            itm[i] = "%02d-%06d-%02d" % (i % 90, i, i % 7)
+        des[i] = "description %d" % (i % 1000)
+        ref[i] = np.nan if i % 3 else "R%d,C%d" % (i, i)
+    qty = rng.randint(1, 10, n).astype("object")
+    seq = (10*np.arange(n)).astype("object")
+    return lvl, itm, des, qty, ref, seq
+
+
+def best(fn, args, repeat=5):
+    """best time of fn, each run on fresh copies of args."""
+    times = []
+    for _ in range(repeat):
+        copies = [arg.copy() for arg in args]
+        start = time.perf_counter()
+        out = fn(*copies)
+        times.append(time.perf_counter()-start)
+    return min(times), out
+
+
+if __name__ == "__main__":
+    args = build(100000)
+    loops, old = best(clean_info_loops, args)
+    vector, new = best(clean_info, args)
+    for a, b in zip(old, new):
+        assert np.array_equal(np.asarray(a, dtype="object"), \
+                              np.asarray(b, dtype="object")), "Mismatch!"
+    print("rows          %d" % len(args[0]))
+    print("loops         %.4f s" % loops)
+    print("vectorized    %.4f s" % vector)
+    print("speedup       %.1fx" % (loops/vector))
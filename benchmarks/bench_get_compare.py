@@ -0,0 +1,63 @@
+"""Benchmark for get_compare: time to diff BOMs whose rows all differ.
+
+Run from the repository root:
+    python benchmarks/bench_get_compare.py
+Every Record differs in Qty, so each one ends up in the result. Sibling
+groups keep the same width while the tree gets deeper, so time per row should
+stay roughly flat as the BOM grows, which shows that collecting the comparison
+result scales linearly.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), \
+                                os.pardir))
+from bomcomparer import BOMTable, DiffResult, get_ancester, get_compare
+
+
+def build(depth, qty, fanout=8):
+    """build a full BOM tree where every assembly has `fanout` children.
+    Inputs:
+        depth: number of levels below the top assembly.
+        qty: Qty of every Record.
+        fanout: number of children per assembly.
+    Outputs:
+        table: BOMTable of the BOM.
+    """
+    rows = []
+
+    def grow(lvl, prefix):
+        for i in range(fanout):
+            nme = "%s%d" % (prefix, i)
+            rows.append((lvl, nme + "-01", "part", qty, "R1", 10*(i+1), nme))
+            if lvl < depth:
+                grow(lvl+1, nme)
+
+    grow(1, "10-")
+    return BOMTable(*[np.asarray(column) for column in zip(*rows)])
+
+
+def run(depth, repeat=3):
+    """best time of get_compare on two BOM trees of the given depth."""
+    best = None
+    for _ in range(repeat):
+        table1 = build(depth, 1.0)
+        table2 = build(depth, 2.0)
+        ancester1, ancester2 = get_ancester(table1, table2)
+        start = time.perf_counter()
+        result = get_compare(table1, ancester1, table2, ancester2, \
+                             DiffResult())
+        cost = time.perf_counter() - start
+        best = cost if best is None else min(best, cost)
+    return best, len(result)
+
+
+if __name__ == "__main__":
+    print("%10s %10s %12s %14s" % ("records", "diff rows", "seconds", \
+                                   "usec per row"))
+    for depth in (2, 3, 4, 5):
+        cost, rows = run(depth)
+        print("%10d %10d %12.4f %14.2f" % (2*rows, rows, cost, \
+                                           1e6*cost/rows))
@@ -0,0 +1,185 @@
+"""Time each stage of a comparison on synthetic BOMs, and catch regressions.
+
+Run from the repository root:
+    python benchmarks/bench_stages.py --size 20000 --save results.json
+    python benchmarks/bench_stages.py --size 20000 --baseline results.json
+The BOMs are written by synthetic.py into a temporary folder. Every stage
+is timed on its own, best of --repeat runs, for both BOMs together:
+    read         pd.read_excel of the workbooks
+    index        get_index
+    info         get_info, with clean_info
+    load_bom     streaming read by openpyxl, which replaces the three above
+    table        BOMTable, with interning and get_family
+    family       get_family alone, the parent/children index
+    refs         parsing Ref Des into designator sets
+    fingerprint  subtree hashes
+    match        matching the level 1 families
+    get_compare  the whole diff
+    merge        the same diff by merge_compare
+    write        writing the xlsx report
+With --baseline, stages slower than the saved ones by more than --tolerance
+are listed and the exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), \
+                                os.pardir))
+from bomcomparer import BOMTable, DiffResult, get_family, get_ancester, \
+                        get_index, get_info, load_bom, match, get_compare, \
+                        merge_compare, write_report
+from synthetic import make_pair, add_arguments, get_spec
+
+# stages faster than this (seconds) are not checked against the baseline
+NOISE = 0.01
+
+
+def best_time(fn, repeat):
+    """best time of fn() over repeat runs, and the value of the last run."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        cost = time.perf_counter() - start
+        best = cost if best is None else min(best, cost)
+    return best, value
+
+
+def fresh(table):
+    """copy of a BOMTable without the parsed Ref Des, hashes and matches."""
+    return BOMTable.from_columns(table.columns())
+
+
+def run_stages(paths, simple, folder, repeat):
+    """time every stage on a pair of BOMs.
+    Inputs:
+        paths: paths of the original and the updated BOM.
+        simple: flag of BOM types.
+        folder: string, folder to write the report in.
+        repeat: number of runs of each stage.
+    Outputs:
+        stages: dict, stage -> seconds.
+        counts: dict of row counts.
+    """
+    import pandas as pd
+    stages = {}
+    stages["read"], frames = best_time( \
+        lambda: [pd.read_excel(path) for path in paths], repeat)
+    stages["index"], indexes = best_time( \
+        lambda: [get_index(f, simple) for f in frames], repeat)
+    stages["info"], infos = best_time( \
+        lambda: [get_info(f, idx, simple) \
+                 for f, idx in zip(frames, indexes)], repeat)
+    stages["load_bom"], infos = best_time( \
+        lambda: [load_bom(path, simple) for path in paths], repeat)
+    stages["table"], tables = best_time( \
+        lambda: [BOMTable(*info) for info in infos], repeat)
+    stages["family"], _ = best_time( \
+        lambda: [get_family(table.lvl) for table in tables], repeat)
+
+    def refs():
+        copies = [fresh(table) for table in tables]
+        start = time.perf_counter()
+        for table in copies:
+            table.refs
+        return time.perf_counter() - start
+    stages["refs"] = min(refs() for _ in range(repeat))
+
+    def fingerprint():
+        copies = [fresh(table) for table in tables]
+        for table in copies:
+            table.refs
+        start = time.perf_counter()
+        for table in copies:
+            table.fingerprint(table.compared)
+        return time.perf_counter() - start
+    stages["fingerprint"] = min(fingerprint() for _ in range(repeat))
+
+    def diff(level1_only, engine=get_compare):
+        table1, table2 = fresh(tables[0]), fresh(tables[1])
+        ancester1, ancester2 = get_ancester(table1, table2)
+        for table in (table1, table2):
+            table.fingerprint(table.compared)
+        start = time.perf_counter()
+        if level1_only:
+            match(table1, ancester1, table2, ancester2)
+            result = None
+        else:
+            result = engine(table1, ancester1, table2, ancester2, \
+                            DiffResult())
+        return time.perf_counter() - start, result
+    stages["match"] = min(diff(True)[0] for _ in range(repeat))
+    runs = [diff(False) for _ in range(repeat)]
+    stages["get_compare"] = min(cost for cost, result in runs)
+    result = runs[-1][1]
+    stages["merge"] = min(diff(False, merge_compare)[0] \
+                          for _ in range(repeat))
+
+    report = os.path.join(folder, "report.xlsx")
+    stages["write"], _ = best_time(lambda: write_report(result, report), \
+                                   repeat)
+    counts = {"rows1": len(tables[0]), "rows2": len(tables[1]), \
+              "diff_rows": len(result)}
+    return stages, counts
+
+
+def check(stages, baseline, tolerance):
+    """list stages slower than the baseline.
+    Inputs:
+        stages: dict, stage -> seconds of this run.
+        baseline: dict, saved results of run_stages.
+        tolerance: allowed slowdown, 0.25 is 25%.
+    Output:
+        list of string, one line per regression.
+    """
+    slow = []
+    for name, cost in stages.items():
+        before = baseline["stages"].get(name)
+        if (before is None) or (cost < NOISE):
+            continue
+        if cost > before*(1+tolerance):
+            slow.append("%-12s %8.4f s, was %8.4f s (%+.0f%%)" % \
+                        (name, cost, before, 100*(cost/before-1)))
+    return slow
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the stages of a " \
+                                     "comparison on synthetic BOMs.")
+    add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", metavar="JSON", help="save the results")
+    parser.add_argument("--baseline", metavar="JSON", \
+        help="results saved earlier, to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    spec = get_spec(args)
+    simple = args.type == "simple"
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_pair(os.path.join(folder, "bom"), spec, simple)
+        stages, counts = run_stages(paths, simple, folder, args.repeat)
+
+    print("%d and %d rows, %d diff rows" % \
+          (counts["rows1"], counts["rows2"], counts["diff_rows"]))
+    for name, cost in stages.items():
+        print("%-12s %8.4f s" % (name, cost))
+    results = {"spec": spec.to_dict(), "type": args.type, "counts": counts, \
+               "stages": stages, "python": platform.python_version(), \
+               "numpy": np.__version__}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slow = check(stages, json.load(f), args.tolerance)
+        for line in slow:
+            print("slower: " + line)
+        sys.exit(1 if slow else 0)
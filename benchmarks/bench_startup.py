@@ -0,0 +1,61 @@
+"""Startup time of the headless command line, checked against a budget.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+Each command runs in a fresh interpreter, the best of several runs is
+compared with STARTUP_BUDGET. Importing the package must not load Qt,
+pandas or openpyxl, and cleaning the rows read from an xlsx file must not
+load pandas. Exit code is 1 if the budget is exceeded.
+"""
+import os
+import sys
+import time
+import subprocess
+
+# seconds allowed from interpreter start to a ready command line
+STARTUP_BUDGET = 0.5
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+COMMANDS = [
+    ("import bomcomparer", [sys.executable, "-c", "import bomcomparer"]),
+    ("python -m bomcomparer --help", \
+     [sys.executable, "-m", "bomcomparer", "--help"]),
+]
+HEAVY = ("PyQt5", "pandas", "openpyxl")
+# clean the rows of a small BOM as load_bom does, without reading a file
+CLEAN = "import numpy as np; from bomcomparer.reader import clean_info; " \
+        "rows = [np.array(x, dtype='object') for x in ([1, 2], ['A-1-01', " \
+        "None], ['a', 'b'], [1, 2], ['R1', None], [10, 20])]; " \
+        "clean_info(*rows)"
+
+
+def best(command, repeat=5):
+    """best wall time of a command."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, \
+                       check=True)
+        times.append(time.perf_counter()-start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    loaded = subprocess.run([sys.executable, "-c", "import sys, bomcomparer; " \
+        "print(' '.join(m for m in %r if m in sys.modules))" % (HEAVY,)], \
+        cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True, \
+        check=True).stdout.split()
+    ok = not loaded
+    print("heavy modules loaded on import: %s" % (", ".join(loaded) or "none"))
+    cleaned = subprocess.run([sys.executable, "-c", "import sys; " + CLEAN + \
+        "; print('pandas' in sys.modules)"], cwd=ROOT, \
+        stdout=subprocess.PIPE, universal_newlines=True, \
+        check=True).stdout.split()
+    ok = ok and (cleaned == ["False"])
+    print("pandas loaded by clean_info: %s" % \
+          ("yes" if cleaned != ["False"] else "no"))
+    for name, command in COMMANDS:
+        cost = best(command)
+        ok = ok and (cost <= STARTUP_BUDGET)
+        print("%-32s %.3f s (budget %.3f s)" % (name, cost, STARTUP_BUDGET))
+    sys.exit(0 if ok else 1)
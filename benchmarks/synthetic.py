@@ -0,0 +1,196 @@
+"""Synthetic BOM workbooks for benchmarks.
+
+Run from the repository root to write a pair of BOMs, the second one a
+changed copy of the first:
+    python benchmarks/synthetic.py out/bom --size 20000 --type standard
+Workbooks follow the layouts get_index/get_info and load_bom expect: a
+simple BOM has its headers in the first row and a top assembly row that is
+skipped, a standard BOM has a title block, a "BOM" row, the headers and
+then the rows. Both end with a blank row, a note and the "Manufacturers"
+block.
+"""
+import argparse
+import random
+
+
+class BOMSpec(object):
+    """parameters of a synthetic BOM."""
+
+    def __init__(self, size=10000, depth=5, fanout=8, duplicate=0.1, \
+                 change=0.05, seed=0):
+        """constructor for BOMSpec class.
+        Inputs:
+            size: number of rows.
+            depth: deepest Level.
+            fanout: largest number of children of an assembly.
+            duplicate: share of rows with the Item Series of a sibling, so
+                       that matching falls back on Item Numbers.
+            change: share of rows changed in the updated BOM.
+            seed: seed of the random generator.
+        """
+        super().__init__()
+        self.size = size
+        self.depth = depth
+        self.fanout = fanout
+        self.duplicate = duplicate
+        self.change = change
+        self.seed = seed
+
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def make_rows(spec, rng):
+    """generate the rows of a BOM tree in BOM order.
+    Inputs:
+        spec: BOMSpec object.
+        rng: random.Random object.
+    Output:
+        list of [Level, Item Number, Description, Qty, Ref Des, Item Seq].
+    """
+    rows = []
+    serial = [0]
+
+    def new_series():
+        serial[0] += 1
+        return "%02d-%05d" % (rng.randint(10, 99), serial[0] % 100000)
+
+    # explicit stack of (Level, Item Series of the siblings so far, seq)
+    stack = [(1, [], 10)]
+    while len(rows) < spec.size:
+        if not stack:
+            stack.append((1, [], 10))
+        lvl, siblings, seq = stack.pop()
+        if (len(siblings) >= spec.fanout) or \
+                ((len(siblings) > 0) and (rng.random() < 1.0/spec.fanout)):
+            continue
+        if siblings and (rng.random() < spec.duplicate):
+            series = rng.choice(siblings)
+        else:
+            series = new_series()
+        siblings.append(series)
+        itm = "%s-%02d" % (series, rng.randint(1, 9))
+        refs = ",".join("R%d" % rng.randint(1, 999) \
+                        for _ in range(rng.randint(0, 4)))
+        rows.append([lvl, itm, "desc " + itm, float(rng.randint(1, 9)), \
+                     refs or None, seq])
+        stack.append((lvl, siblings, seq+10))
+        if (lvl < spec.depth) and (rng.random() < 0.3):
+            stack.append((lvl+1, [], 10))
+    return rows
+
+
+def change_rows(rows, spec, rng):
+    """copy a BOM with a share of its rows changed.
+    A changed row has its Qty, Ref Des or Item Number revision changed, or
+    is removed together with its subtree, or gets a new sibling after it.
+    Inputs:
+        rows: list of rows from make_rows.
+        spec: BOMSpec object.
+        rng: random.Random object.
+    Output:
+        list of rows of the updated BOM.
+    """
+    changed = []
+    removed = None
+    for row in rows:
+        if (removed is not None) and (row[0] > removed):
+            continue
+        removed = None
+        row = list(row)
+        kind = rng.randrange(5) if rng.random() < spec.change else -1
+        if kind == 0:
+            removed = row[0]
+            continue
+        if kind == 1:
+            row[3] += 1
+        elif kind == 2:
+            row[4] = ",".join(x for x in (row[4], "C%d" % rng.randint(1, 99)) \
+                              if x)
+        elif kind == 3:
+            row[1] = row[1][:-2] + "%02d" % rng.randint(10, 99)
+        changed.append(row)
+        if kind == 4:
+            itm = "77-%05d-01" % rng.randint(0, 99999)
+            changed.append([row[0], itm, "new", 1.0, None, row[5]+5])
+    return changed
+
+
+def write_bom(path, rows, simple):
+    """write rows into a workbook in the simple or standard layout.
+    Inputs:
+        path: string, path of the xlsx file.
+        rows: list of rows from make_rows or change_rows.
+        simple: flag of BOM types.
+    """
+    from openpyxl import Workbook
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet("BOM")
+    if simple:
+        sheet.append(["Level", "Number", "Description", "BOM.Qty", \
+                      "BOM.Ref Des", "BOM.Item Seq", "Lifecycle"])
+        sheet.append([0, "TOP-00000-01", "top assembly", 1, None, 0, None])
+        for row in rows:
+            sheet.append(row + ["Production"])
+    else:
+        sheet.append(["Bill of Materials Report"])
+        sheet.append(["Generated", "synthetic"])
+        sheet.append(["BOM"])
+        sheet.append(["Level", "Lifecycle", "Item Number", \
+                      "Item Description", "Qty", "Ref Des", "Item Seq"])
+        for row in rows:
+            sheet.append([row[0], "Production"] + row[1:])
+    sheet.append([None])
+    sheet.append(["End of BOM"])
+    sheet.append(["Manufacturers"])
+    sheet.append(["Manufacturer", "Part Number"])
+    book.save(path)
+
+
+def make_pair(prefix, spec, simple):
+    """write an original BOM and its changed copy.
+    Inputs:
+        prefix: string, the files are prefix_1.xlsx and prefix_2.xlsx.
+        spec: BOMSpec object.
+        simple: flag of BOM types.
+    Outputs:
+        path1, path2: paths of the original and the updated BOM.
+    """
+    rng = random.Random(spec.seed)
+    rows = make_rows(spec, rng)
+    path1 = prefix + "_1.xlsx"
+    path2 = prefix + "_2.xlsx"
+    write_bom(path1, rows, simple)
+    write_bom(path2, change_rows(rows, spec, rng), simple)
+    return path1, path2
+
+
+def add_arguments(parser):
+    """add the BOMSpec options to an argparse parser."""
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--duplicate", type=float, default=0.1, \
+        help="share of rows sharing the Item Series of a sibling")
+    parser.add_argument("--change", type=float, default=0.05, \
+        help="share of rows changed in the updated BOM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--type", choices=("simple", "standard"), \
+        default="simple")
+
+
+def get_spec(args):
+    """BOMSpec of parsed arguments, see add_arguments."""
+    return BOMSpec(args.size, args.depth, args.fanout, args.duplicate, \
+                   args.change, args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic BOM " \
+                                     "and a changed copy of it.")
+    parser.add_argument("prefix", help="files are PREFIX_1.xlsx, PREFIX_2.xlsx")
+    add_arguments(parser)
+    args = parser.parse_args()
+    for path in make_pair(args.prefix, get_spec(args), args.type == "simple"):
+        print(path)
@@ -0,0 +1,21 @@
+"""BOM Comparer engine: read two BOMs, match their items and report changes.
+
+The package never imports Qt, and pandas/openpyxl are imported only when a
+BOM is read or a report is written, so scripts and the command line
+(python -m bomcomparer) start quickly.
+"""
+from .table import Record, BOMTable, get_family, get_ancester, \
+                   reset_vocabulary
+from .reader import SIMPLE_HEADER, STANDARD_HEADER, get_index, get_info, \
+                    clean_info, get_series, load_bom, read_bom, load_table, \
+                    load_tables
+from .cache import BOMCache
+from .instrument import Profiler
+from .columnar import write_columnar, read_columnar, convert_boms
+from .report import DiffResult, ReportWriter, XlsxReport, CsvReport, \
+                    ParquetReport, open_report, write_report
+from .merge import merge_compare
+from .shared import SharedStore
+from .compare import Cancelled, CompareMemo, TableMemo, match, \
+                     get_compare, compare_tables, default_name, main
+from .history import compare_history, change_matrix, write_history, history
@@ -0,0 +1,8 @@
+"""python -m bomcomparer OLD NEW [--type simple|standard] [-o OUT]"""
+import sys
+
+from .cli import run
+
+
+if __name__ == "__main__":
+    sys.exit(run())
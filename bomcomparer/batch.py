@@ -0,0 +1,199 @@
+"""Compare many BOM pairs listed in a manifest, over a process pool."""
+import os
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .reader import load_table
+from .cache import BOMCache
+from .compare import compare_tables, default_name
+from .shared import SharedStore, attach_store, share_tracker
+
+
+def read_manifest(path):
+    """read the jobs of a batch comparison.
+    The manifest is a CSV file with columns old, new, output and type, or a
+    JSON file holding a list of objects with the same keys. output may be
+    left empty, type is "simple" (default) or "standard". Relative paths
+    are taken from the folder of the manifest.
+    Input:
+        path: string, path of manifest.
+    Output:
+        jobs: list of dict with keys old, new, output and simple.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path) as f:
+            entries = json.load(f)
+    else:
+        with open(path, newline="") as f:
+            entries = list(csv.DictReader(f))
+
+    jobs = []
+    for entry in entries:
+        old = os.path.join(folder, entry["old"])
+        new = os.path.join(folder, entry["new"])
+        output = os.path.join(folder, entry.get("output") or \
+                              default_name(old, new))
+        kind = (entry.get("type") or "simple").strip().lower()
+        if kind not in ("simple", "standard"):
+            raise ValueError("Unknown BOM type '" + kind + "' in " + path)
+        jobs.append({"old": old, "new": new, "output": output, \
+                     "simple": kind == "simple"})
+    return jobs
+
+
+def timed_load(path, simple, cache=None):
+    """load_table, also returning the seconds it took."""
+    start = time.perf_counter()
+    table = load_table(path, simple, cache)
+    return table, time.perf_counter()-start
+
+
+def timed_compare(table1, table2, file_name):
+    """compare_tables, returning number of result rows and seconds."""
+    start = time.perf_counter()
+    result = compare_tables(table1, table2, file_name)
+    return len(result), time.perf_counter()-start
+
+
+def shared_compare(handle, k1, k2, file_name):
+    """timed_compare of tables k1 and k2 of a SharedStore."""
+    store = attach_store(handle)
+    return timed_compare(store.table(k1), store.table(k2), file_name)
+
+
+def submit(pool, fn, *args):
+    """run fn on the pool, or right away when pool is None."""
+    if pool is not None:
+        return pool.submit(fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def run_batch(jobs, workers=None, cache=None):
+    """run a batch of comparisons on a process pool.
+    Every distinct BOM file is parsed once, however many jobs use it, and
+    the parsed BOMs are put in one SharedStore that the workers comparing
+    them attach to, instead of pickling a BOM for each of its jobs.
+    Inputs:
+        jobs: list of dict, as returned by read_manifest.
+        workers: number of worker processes, None for the number of CPUs,
+                 1 runs every job in this process.
+        cache: BOMCache object to reuse BOMs parsed by earlier runs.
+    Output:
+        report: list of dict, one per job, with keys old, new, output, type,
+                status ("ok" or "failed"), error, rows, load_seconds and
+                compare_seconds.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    pool = None
+    if workers > 1:
+        share_tracker()
+        pool = ProcessPoolExecutor(max_workers=workers)
+    store = None
+    try:
+        # parse every BOM once
+        files = {}
+        for job in jobs:
+            for path in (job["old"], job["new"]):
+                key = (path, job["simple"])
+                if key not in files:
+                    files[key] = submit(pool, timed_load, path, \
+                                        job["simple"], cache)
+
+        # share the parsed BOMs with the workers
+        if pool is not None:
+            loaded = [key for key, future in files.items() \
+                      if future.exception() is None]
+            store = SharedStore.create([files[key].result()[0] \
+                                        for key in loaded])
+            shared = {key: k for k, key in enumerate(loaded)}
+
+        # compare every pair
+        report = []
+        for job in jobs:
+            entry = {"old": job["old"], "new": job["new"], \
+                     "output": job["output"], \
+                     "type": "simple" if job["simple"] else "standard", \
+                     "status": "failed", "error": None, "rows": None, \
+                     "load_seconds": 0.0, "compare_seconds": None}
+            tables = []
+            for path in (job["old"], job["new"]):
+                future = files[(path, job["simple"])]
+                if future.exception() is not None:
+                    entry["error"] = path + ": " + repr(future.exception())
+                    break
+                table, seconds = future.result()
+                tables.append(table)
+                entry["load_seconds"] += seconds
+            else:
+                if store is None:
+                    entry["future"] = submit(pool, timed_compare, tables[0], \
+                                             tables[1], job["output"])
+                else:
+                    entry["future"] = pool.submit(shared_compare, \
+                        store.handle, shared[(job["old"], job["simple"])], \
+                        shared[(job["new"], job["simple"])], job["output"])
+            report.append(entry)
+
+        for entry in report:
+            future = entry.pop("future", None)
+            if future is None:
+                continue
+            if future.exception() is not None:
+                entry["error"] = repr(future.exception())
+            else:
+                entry["rows"], entry["compare_seconds"] = future.result()
+                entry["status"] = "ok"
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if store is not None:
+            store.close()
+
+    return report
+
+
+def batch_cli(argv, prog="BOMComparer"):
+    """command line entry of batch comparison.
+    Inputs:
+        argv: list of command line arguments.
+        prog: name of the program in usage and error messages.
+    Output:
+        exit code, 0 if every job succeeded.
+    """
+    parser = argparse.ArgumentParser(prog=prog, \
+        description="Compare many BOM pairs listed in a manifest.")
+    parser.add_argument("--batch", required=True, metavar="MANIFEST", \
+        help="CSV or JSON file with columns old, new, output and type")
+    parser.add_argument("--workers", type=int, default=None, \
+        help="number of worker processes, default is the number of CPUs")
+    parser.add_argument("--report", metavar="JSON", \
+        help="write per-job timing and failures to this file")
+    parser.add_argument("--cache", metavar="FOLDER", \
+        help="reuse BOMs parsed by earlier runs, cached in this folder")
+    args = parser.parse_args(argv)
+
+    cache = None if args.cache is None else BOMCache(args.cache)
+    report = run_batch(read_manifest(args.batch), args.workers, cache)
+    for entry in report:
+        if entry["status"] == "ok":
+            print("ok      load %7.2fs  compare %7.2fs  %7d rows  %s" % \
+                  (entry["load_seconds"], entry["compare_seconds"], \
+                   entry["rows"], entry["output"]))
+        else:
+            print("failed  " + entry["old"] + " vs " + entry["new"] + \
+                  "\n        " + entry["error"])
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if all(entry["status"] == "ok" for entry in report) else 1
@@ -0,0 +1,171 @@
+"""On-disk cache of parsed BOMs."""
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+
+from .table import BOMTable, Vocabulary
+from .reader import read_bom
+
+
+# bump when the parsing rules change, so that cached BOMs are parsed again
+PARSER_VERSION = 1
+
+# default size limit of the parsed BOM cache, in bytes
+CACHE_SIZE = 512 << 20
+
+# folders put writes into are renamed within seconds; ones left this long
+# (seconds) belong to a process that was killed while writing
+TEMP_AGE = 3600
+
+
+class BOMCache(object):
+    """on-disk cache of parsed BOMs.
+    Each entry is a folder named after the SHA-1 of the BOM file, the BOM
+    type and PARSER_VERSION. Numeric columns and string codes are .npy files
+    read with memory mapping, the distinct strings are kept in strings.json.
+    Least recently used entries are removed once the cache outgrows
+    max_bytes.
+    """
+    def __init__(self, folder=None, max_bytes=CACHE_SIZE):
+        """constructor for BOMCache class.
+        Inputs:
+            folder: string, cache folder. None means $BOMCOMPARER_CACHE,
+                    or ~/.bomcomparer/cache.
+            max_bytes: size limit of the cache.
+        """
+        super().__init__()
+        if folder is None:
+            folder = os.environ.get("BOMCOMPARER_CACHE") or \
+                os.path.join(os.path.expanduser("~"), ".bomcomparer", "cache")
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+
+    def digest(self, path):
+        """SHA-1 of the file content."""
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+
+    def key(self, path, simple):
+        """name of the cache entry of a BOM."""
+        return "%s-%s-v%d" % (self.digest(path), \
+                              "simple" if simple else "standard", PARSER_VERSION)
+
+
+    def get(self, key):
+        """get the cached BOMTable, None if it is not cached."""
+        entry = os.path.join(self.folder, key)
+        if not os.path.isdir(entry):
+            return None
+        try:
+            with open(os.path.join(entry, "strings.json")) as f:
+                values = json.load(f)
+            strings = np.empty(len(values), dtype="object")
+            strings[:] = values
+            columns = {}
+            for name in BOMTable.fields:
+                column = np.load(os.path.join(entry, name + ".npy"), \
+                                 mmap_mode="r")
+                if name in BOMTable.strings:
+                    column = strings[column]
+                columns[name] = column
+        except (OSError, ValueError):
+            return None
+
+        # mark as recently used
+        os.utime(entry)
+        return BOMTable.from_columns(columns)
+
+
+    def put(self, key, table):
+        """store a BOMTable, then evict old entries if needed."""
+        # one vocabulary for all string columns of the entry
+        vocab = Vocabulary()
+        columns = table.columns()
+        for name in BOMTable.strings:
+            columns[name] = vocab.encode(columns[name])
+
+        # write into a private folder first, then rename it into place
+        entry = os.path.join(self.folder, key)
+        temp = entry + ".tmp%d" % os.getpid()
+        os.makedirs(temp, exist_ok=True)
+        try:
+            with open(os.path.join(temp, "strings.json"), "w") as f:
+                json.dump(vocab.values, f)
+            for name, column in columns.items():
+                np.save(os.path.join(temp, name + ".npy"), column)
+            os.rename(temp, entry)
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+        self.evict()
+
+
+    def load(self, path, simple):
+        """get a BOMTable from the cache, parse and store it on a miss.
+        Inputs:
+            path: string, path of BOM.
+            simple: flag of BOM types.
+        Output:
+            BOMTable of the BOM.
+        """
+        key = self.key(path, simple)
+        table = self.get(key)
+        if table is None:
+            table = BOMTable(*read_bom(path, simple))
+            try:
+                self.put(key, table)
+            except (OSError, TypeError, ValueError):
+                # unwritable folder, or values that JSON cannot store
+                pass
+        return table
+
+
+    def evict(self):
+        """remove least recently used entries until the cache fits, and
+        the folders left behind by put in killed processes."""
+        entries = []
+        for name in os.listdir(self.folder):
+            entry = os.path.join(self.folder, name)
+            if not os.path.isdir(entry):
+                continue
+            if ".tmp" in name:
+                try:
+                    if time.time() - os.path.getmtime(entry) > TEMP_AGE:
+                        shutil.rmtree(entry, ignore_errors=True)
+                except OSError:
+                    # renamed or removed by its own process meanwhile
+                    pass
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, x)) \
+                       for x in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total = total-size
+
+
+    def invalidate(self, path):
+        """remove every cached entry of a BOM file."""
+        if not os.path.isdir(self.folder):
+            return
+        digest = self.digest(path)
+        for name in os.listdir(self.folder):
+            if name.startswith(digest):
+                shutil.rmtree(os.path.join(self.folder, name), \
+                              ignore_errors=True)
+
+
+    def clear(self):
+        """remove the whole cache."""
+        shutil.rmtree(self.folder, ignore_errors=True)
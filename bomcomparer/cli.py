@@ -0,0 +1,83 @@
+"""Command line entry of BOM Comparer, free of any Qt import."""
+import sys
+import argparse
+
+from .cache import BOMCache
+from .compare import main
+from .history import history
+from .columnar import convert_boms
+from .batch import batch_cli
+
+
+# name of the command line in usage and error messages
+PROG = "python -m bomcomparer"
+
+
+def run(argv=None):
+    """compare two BOMs, the revisions of a BOM, or a batch of BOM pairs,
+    or convert BOMs to columnar files with --convert.
+    Input:
+        argv: list of command line arguments, default is sys.argv[1:].
+    Output:
+        exit code.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if "--batch" in argv:
+        return batch_cli(argv, PROG)
+
+    parser = argparse.ArgumentParser(prog=PROG, \
+        description="Compare an original BOM with an updated BOM, or every " \
+                    "revision of a BOM with the next one.", \
+        epilog="Use --batch MANIFEST to compare many pairs at once.")
+    parser.add_argument("boms", nargs="+", metavar="BOM", \
+        help="BOM revisions, oldest first, .xlsx, .xls, or .arrow/.parquet " \
+             "written by --convert")
+    parser.add_argument("--type", choices=("simple", "standard"), \
+        default="simple", help="BOM format, default is simple")
+    parser.add_argument("-o", "--output", default=None, \
+        help="report file, .xlsx, .csv or .parquet, default is " \
+             "OLD_NEW_cmp.xlsx, or " \
+             "FIRST_LAST_history.xlsx for more than two BOMs")
+    parser.add_argument("--workers", type=int, default=None, \
+        help="processes reading the two BOMs, and comparing them with " \
+             "--engine shard; 1 does it serially")
+    parser.add_argument("--cache", metavar="FOLDER", \
+        help="reuse BOMs parsed by earlier runs, cached in this folder")
+    parser.add_argument("--engine", choices=("tree", "merge", "shard"), \
+        default="tree", help="walk the BOM trees, diff them level by " \
+                             "level with sorted joins, or walk the level 1 " \
+                             "subtrees in --workers processes; same report")
+    parser.add_argument("--profile", metavar="JSON", \
+        help="save the time, peak memory and rows of each stage")
+    parser.add_argument("--profile-sheet", action="store_true", \
+        help="add the timing to the xlsx report as sheet Timing")
+    parser.add_argument("--convert", choices=("arrow", "parquet"), \
+        help="only parse each BOM and store it next to it in this format, " \
+             "to compare it later without parsing it again")
+    args = parser.parse_args(argv)
+    if (args.convert is None) and (len(args.boms) < 2):
+        parser.error("at least two BOMs are needed")
+    # options of the comparison of two BOMs, which --convert and history
+    # comparisons do not take
+    given = [name for name, value in \
+             (("--engine", args.engine != "tree"), \
+              ("--profile", args.profile is not None), \
+              ("--profile-sheet", args.profile_sheet)) if value]
+    if given and ((args.convert is not None) or (len(args.boms) > 2)):
+        parser.error(", ".join(given) + " cannot be used with --convert or " \
+                     "more than two BOMs")
+
+    cache = None if args.cache is None else BOMCache(args.cache)
+    if args.convert is not None:
+        for path in convert_boms(args.boms, args.type == "simple", \
+                                 "." + args.convert, args.workers, cache):
+            print(path)
+    elif len(args.boms) == 2:
+        main(args.boms[0], args.boms[1], args.type == "simple", args.output, \
+             args.workers, cache, profile=args.profile, \
+             profile_sheet=args.profile_sheet, engine=args.engine)
+    else:
+        history(args.boms, args.type == "simple", args.output, \
+                args.workers, cache)
+    return 0
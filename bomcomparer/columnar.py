@@ -0,0 +1,169 @@
+"""Parsed BOMs stored as Arrow or Parquet files.
+A columnar file holds a BOMTable as parsed, with its parent and children
+index, so comparing it skips reading the excel file. pyarrow is imported
+only when such a file is read or written.
+"""
+import os
+import json
+import numpy as np
+
+from .table import BOMTable, Vocabulary, intern_strings
+
+
+# extensions of columnar BOM files, Arrow IPC files are memory mapped
+ARROW_TYPES = (".arrow", ".feather")
+PARQUET_TYPES = (".parquet", ".pq")
+# schema metadata marking a file written by write_columnar, and the
+# versions read_columnar reads; version 1 stored numbers in string columns
+# as their text
+FORMAT_KEY = b"bomcomparer"
+FORMAT_VERSION = b"2"
+FORMAT_VERSIONS = (b"1", b"2")
+# numbers in string columns are stored as this character and their JSON
+# text; excel cells cannot hold it, so no string read from excel starts
+# with it
+TYPED = "\x00"
+
+# column of the file for each column of BOMTable, children excepted
+NAMES = (("lvl", "level"), ("itm", "item"), ("nme", "series"), \
+         ("des", "desc"), ("qty", "qty"), ("ref", "ref"), ("seq", "seq"), \
+         ("parent", "parent"))
+
+
+def is_columnar(path):
+    """check whether path is a columnar BOM file, by its extension."""
+    return os.path.splitext(path)[1].lower() in ARROW_TYPES + PARQUET_TYPES
+
+
+def encode_strings(pa, values):
+    """dictionary-encode a column of strings.
+    Values are encoded by a Vocabulary, so they keep their type: numbers
+    and booleans are stored as TYPED and their JSON text, and read back as
+    they were. Other values are stored as their text, None and NaN as
+    nulls.
+    Inputs:
+        pa: pyarrow module.
+        values: numpy array of object.
+    Output:
+        pyarrow DictionaryArray.
+    """
+    vocab = Vocabulary()
+    codes = vocab.encode(values)
+    texts = []
+    missing = np.zeros(len(vocab), dtype="bool")
+    for k, x in enumerate(vocab.values):
+        if (x is None) or (x != x):
+            missing[k] = True
+            texts.append("")
+        elif isinstance(x, str):
+            texts.append(x)
+        elif isinstance(x, (bool, int, float)):
+            texts.append(TYPED + json.dumps(x))
+        else:
+            texts.append(str(x))
+    return pa.DictionaryArray.from_arrays( \
+        pa.array(codes, mask=missing[codes]), pa.array(texts, pa.string()))
+
+
+def decode_strings(column):
+    """turn a dictionary-encoded column back into interned strings.
+    Numbers stored by encode_strings get their type back, and nulls are
+    read back as NaN, as in a BOM read from excel.
+    Input:
+        column: pyarrow DictionaryArray.
+    Output:
+        numpy array of object.
+    """
+    vocab = np.empty(len(column.dictionary)+1, dtype="object")
+    vocab[:-1] = intern_strings(column.dictionary.to_numpy( \
+        zero_copy_only=False))
+    vocab[-1] = np.nan
+    for k, x in enumerate(vocab[:-1].tolist()):
+        if x.startswith(TYPED):
+            vocab[k] = json.loads(x[len(TYPED):])
+    codes = column.indices.fill_null(len(vocab)-1)
+    return vocab[codes.to_numpy()]
+
+
+def write_columnar(table, path):
+    """store a BOMTable in an Arrow or Parquet file.
+    Strings are dictionary-encoded, and the children of Record i are the
+    list in row i of column "children", so its offsets are child_start.
+    Inputs:
+        table: BOMTable object.
+        path: string, path of the file, .arrow/.feather or .parquet/.pq.
+    """
+    import pyarrow as pa
+    arrays = []
+    for name, column in NAMES:
+        values = table.column(name)
+        if name in BOMTable.strings:
+            arrays.append(encode_strings(pa, values))
+        else:
+            arrays.append(pa.array(np.asarray(values)))
+    arrays.append(pa.ListArray.from_arrays( \
+        pa.array(np.asarray(table.child_start), pa.int32()), \
+        pa.array(np.asarray(table.child_indices), pa.int32())))
+    data = pa.Table.from_arrays(arrays, \
+        names=[column for name, column in NAMES] + ["children"], \
+        metadata={FORMAT_KEY: FORMAT_VERSION})
+
+    if os.path.splitext(path)[1].lower() in PARQUET_TYPES:
+        import pyarrow.parquet as pq
+        pq.write_table(data, path)
+    else:
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, data.schema) as writer:
+                writer.write_table(data)
+
+
+def read_columnar(path):
+    """read a BOMTable stored by write_columnar.
+    Arrow files are memory mapped, and numeric columns and the children
+    index are numpy views of the mapped file, read-only and not copied.
+    Input:
+        path: string, path of the file.
+    Output:
+        BOMTable of the BOM.
+    """
+    import pyarrow as pa
+    if os.path.splitext(path)[1].lower() in PARQUET_TYPES:
+        import pyarrow.parquet as pq
+        data = pq.read_table(path, memory_map=True)
+    else:
+        data = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    metadata = data.schema.metadata or {}
+    if metadata.get(FORMAT_KEY) not in FORMAT_VERSIONS:
+        raise ValueError(path + " is not a BOM written by BOM Comparer.")
+
+    columns = {}
+    for name, column in NAMES:
+        values = data.column(column).combine_chunks()
+        if name in BOMTable.strings:
+            columns[name] = decode_strings(values)
+        else:
+            columns[name] = values.to_numpy()
+    children = data.column("children").combine_chunks()
+    columns["child_start"] = children.offsets.to_numpy()
+    columns["child_indices"] = children.values.to_numpy()
+    return BOMTable.from_columns(columns)
+
+
+def convert_boms(paths, simple, extension=".arrow", workers=None, \
+                 cache=None):
+    """parse BOMs once and store each of them in a columnar file.
+    Inputs:
+        paths: list of string, paths of BOMs.
+        simple: flag of BOM types.
+        extension: string, type of the files written, such as ".parquet".
+        workers: number of processes to read the BOMs, see load_tables.
+        cache: BOMCache object to reuse parsed BOMs, None to parse them.
+    Output:
+        list of string, paths of the files written, next to the BOMs.
+    """
+    from .reader import load_tables
+    outputs = [os.path.splitext(path)[0] + extension for path in paths]
+    def done(i, table):
+        write_columnar(table, outputs[i])
+    load_tables(paths, simple, workers, cache, done)
+    return outputs
@@ -0,0 +1,554 @@
+"""Match BOM items and compare two BOM trees."""
+import os
+import time
+from bisect import bisect_left
+import numpy as np
+
+from .table import VOCABULARY, get_ancester, encoding_figures
+from .reader import load_table, load_tables
+from .report import DiffResult, open_report, write_report
+from .merge import merge_compare
+from .instrument import PROFILE_ENV, PROFILE_SHEET, PROFILE_COLUMNS, Profiler
+
+
+# get_compare reports progress every time this many more rows are matched
+PROGRESS_STEP = 2000
+
+# prepare_table checks for cancellation every time this many more sibling
+# groups are indexed
+PREPARE_STEP = 1000
+
+# number of prepared BOMTables a TableMemo keeps
+TABLE_MEMO_SIZE = 4
+
+
+class Cancelled(Exception):
+    """raised by a progress callback to stop a running comparison."""
+
+
+def no_progress(stage, rows, percent):
+    """progress callback that ignores every report."""
+
+
+def index_family(table, rows):
+    """index a Record family by Item Series and by Item Number.
+    When table.families is a dict, the indexes are kept there and reused
+    the next time the same family is matched.
+    Inputs:
+        table: BOMTable of the family.
+        rows: numpy array, index of Records in the family.
+    Outputs:
+        series: dict, code of Item Series -> list of index of Records in
+                rows.
+        number: dict, code of Item Number -> list of index of Records in
+                rows.
+    """
+    # sibling groups never overlap, so the first row names the group
+    key = (int(rows[0]), len(rows)) if len(rows) else None
+    if (table.families is not None) and (key in table.families):
+        return table.families[key]
+
+    series = {}
+    number = {}
+    for i, nme, itm in zip(rows.tolist(), table.nme[rows].tolist(), \
+                           table.itm[rows].tolist()):
+        series.setdefault(nme, []).append(i)
+        number.setdefault(itm, []).append(i)
+
+    if table.families is not None:
+        table.families[key] = (series, number)
+    return series, number
+
+
+def match_family(table, rows, series, series_other, number_other):
+    """set match code of one family against the other family.
+    Inputs:
+        table: BOMTable of the family.
+        rows: numpy array, index of Records in the family.
+        series: Item Series index of the family.
+        series_other: Item Series index of the other family.
+        number_other: Item Number index of the other family.
+    """
+    for i, nme, itm in zip(rows.tolist(), table.nme[rows].tolist(), \
+                           table.itm[rows].tolist()):
+        if (len(series[nme]) > 1) or (len(series_other.get(nme, ())) > 1):
+            found = number_other.get(itm)
+        else:
+            found = series_other.get(nme)
+        table.match[i] = -1 if found is None else found[0]
+
+
+def match(table1, rows1, table2, rows2):
+    """find the item matched in BOM2 for item in BOM1, and vice versa.
+    Inputs:
+        table1: BOMTable of BOM 1.
+        rows1: numpy array, index of a Record family in BOM 1, or None.
+        table2: BOMTable of BOM 2.
+        rows2: numpy array, index of a Record family in BOM 2, or None.
+    Matching Rules:
+        0. match code: -1, no Record in the other family matched this Record.
+                       integer >= 0, the index of the matched Record in the
+                               other BOMTable.
+        1. match the Item accroding to Item Series.
+        2. if duplicates exist, match the Item according to Item Number.
+    """
+
+    # special cases
+    if rows1 is None:
+        table2.match[rows2] = -1
+        return
+    if rows2 is None:
+        table1.match[rows1] = -1
+        return
+
+    # index both families once, every lookup below is a dict access
+    series1, number1 = index_family(table1, rows1)
+    series2, number2 = index_family(table2, rows2)
+
+    # match by Item Series, rematch duplicates by Item Number
+    match_family(table1, rows1, series1, series2, number2)
+    match_family(table2, rows2, series2, series1, number1)
+
+
+class CompareMemo(object):
+    """rows reported by the last comparison, by pair of subtrees.
+    A pair of Records with children is keyed by the fingerprints of both
+    subtrees (None for a missing side), and maps to the span of rows it
+    produced in the last DiffResult. The rows of a pair depend on nothing
+    but the content of its two subtrees, so when the same pair shows up in
+    the next comparison its rows are copied instead of matched again. Keep
+    one CompareMemo across comparisons to re-compare after a small edit in
+    about the time it takes to copy the result.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+
+    def clear(self):
+        """forget the last comparison."""
+        self.result = None
+        self.spans = {}
+        self.starts = []
+        self.keys = []
+
+
+    def update(self, result, spans):
+        """remember a finished comparison.
+        Inputs:
+            result: DiffResult of the comparison.
+            spans: dict, key of pair -> (start, end) of its rows in result.
+        """
+        self.result = result
+        self.spans = spans
+        order = sorted(spans, key=lambda key: spans[key][0])
+        self.starts = [spans[key][0] for key in order]
+        self.keys = order
+
+
+    def reuse(self, key, result, spans):
+        """copy the rows of a pair compared last time.
+        The spans nested in the copied rows are moved into spans too, so
+        they can be reused by the comparison after this one.
+        Inputs:
+            key: key of the pair.
+            result: DiffResult to append the rows to.
+            spans: dict of spans of the running comparison.
+        Output:
+            True if the rows were copied, False if the pair is unknown.
+        """
+        span = self.spans.get(key)
+        if span is None:
+            return False
+        start, end = span
+        offset = len(result) - start
+        result.extend(self.result, start, end)
+        k = bisect_left(self.starts, start)
+        while (k < len(self.starts)) and (self.starts[k] < end):
+            inner = self.spans[self.keys[k]]
+            spans[self.keys[k]] = (inner[0]+offset, inner[1]+offset)
+            k += 1
+        return True
+
+
+def prepare_table(table, check=None):
+    """do the per-BOM work of a comparison ahead of time.
+    The compared columns of every subtree are hashed, Ref Des are parsed,
+    and every sibling group is indexed by Item Series and Item Number into
+    table.families, so that comparing the table afterwards only walks the
+    changed subtrees.
+    Inputs:
+        table: BOMTable object, prepared in place.
+        check: function check(), called between steps, that may raise
+               Cancelled to stop, or None.
+    """
+    check = check or (lambda: None)
+    table.fingerprint(table.compared)
+    check()
+    families = {}
+    table.families = families
+    index_family(table, np.flatnonzero(table.lvl == 1))
+    start = table.child_start
+    for k, i in enumerate(np.flatnonzero(np.diff(start)).tolist()):
+        if k % PREPARE_STEP == 0:
+            check()
+        index_family(table, table.child_indices[start[i]:start[i+1]])
+
+
+def get_stamp(path):
+    """modification time and size of a file, None if it cannot be read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class TableMemo(object):
+    """BOMTables read and prepared ahead of a comparison, by path of BOM.
+    An entry is only used while its file keeps the modification time and
+    size it had when it was read, so a BOM saved again is read again. Keep
+    one TableMemo across comparisons and load each BOM into it as soon as it
+    is picked, then main only has to diff the tables. The least recently
+    used tables are dropped once more than size are kept.
+    """
+
+    def __init__(self, size=TABLE_MEMO_SIZE):
+        super().__init__()
+        self.size = size
+        self.clear()
+
+
+    def clear(self):
+        """forget all tables."""
+        # (path, simple) -> (stamp, table), least recently used first
+        self.tables = {}
+
+
+    def get(self, path, simple):
+        """get the prepared BOMTable of a BOM, None if it is not kept or
+        the file changed since it was read."""
+        key = (os.path.abspath(path), simple)
+        entry = self.tables.pop(key, None)
+        if (entry is None) or (entry[0] != get_stamp(path)):
+            return None
+        self.tables[key] = entry
+        return entry[1]
+
+
+    def load(self, path, simple, cache=None, check=None):
+        """get the prepared BOMTable of a BOM, reading it on a miss.
+        Inputs:
+            path: string, path of BOM.
+            simple: flag of BOM types.
+            cache: BOMCache object, or None to parse the file.
+            check: function check() that may raise Cancelled, called after
+                   the file is read and while the table is prepared. The
+                   file itself is read to its end.
+        Output:
+            BOMTable of the BOM, see prepare_table. Raises Cancelled if the
+            vocabulary is reset while the BOM is read, see
+            reset_vocabulary.
+        """
+        table = self.get(path, simple)
+        if table is not None:
+            return table
+        # stamp first, a file saved while it is read is read again next time
+        stamp = get_stamp(path)
+        generation = VOCABULARY.generation
+        table = load_table(path, simple, cache)
+        if check is not None:
+            check()
+        prepare_table(table, check)
+        if VOCABULARY.generation != generation:
+            raise Cancelled()
+        key = (os.path.abspath(path), simple)
+        self.tables.pop(key, None)
+        self.tables[key] = (stamp, table)
+        while len(self.tables) > self.size:
+            del self.tables[next(iter(self.tables))]
+        return table
+
+
+def get_steps(table1, rows1, table2, rows2, subtree1, subtree2, refs1, \
+              refs2):
+    """list the pairs of Records to report after two families are matched.
+    Records only in family2 come first, then removed and changed Records of
+    family1. Matched pairs that agree and hold the same subtrees are left
+    out.
+    Inputs:
+        table1, rows1, table2, rows2: the families given to match.
+        subtree1, subtree2: fingerprints of BOMTable.compared of each table.
+        refs1, refs2: Ref Des sets of each table.
+    Output:
+        steps: list of (i, j, children1, children2), the pair of Records,
+               -1 for a missing side, and the families below them.
+    """
+    steps = []
+    if rows2 is not None:
+        for j in rows2.tolist():
+            if table2.match[j] == -1:
+                steps.append((-1, j, None, table2.children(j)))
+
+    if rows1 is not None:
+        for i in rows1.tolist():
+            j = table1.match[i]
+            if j == -1:
+                steps.append((i, -1, table1.children(i), None))
+            elif (subtree1[i] != subtree2[j]) or \
+                    (table1.itm[i] != table2.itm[j]) or \
+                    (table1.qty[i] != table2.qty[j]) or \
+                    (refs1[i] != refs2[j]):
+                steps.append((i, j, table1.children(i), \
+                              table2.children(j)))
+    return steps
+
+
+def get_compare(table1, rows1, table2, rows2, result, progress=None, \
+                memo=None, profiler=None, pair=(-1, -1)):
+    """compare two Record families together with all their descendants.
+    Both trees are walked with an explicit stack instead of recursion, so
+    the depth of a BOM is not limited by the interpreter. At each level,
+    Records only in family2 come first, then removed and changed Records of
+    family1, each followed by the comparison of its children.
+    A matched pair is changed when its Item Number, Qty or set of Ref Des
+    differ, whatever the order or ranges of the designators,
+    or when any Record below it does: the compared columns of every subtree
+    are hashed bottom-up, so a pair with equal hashes is skipped at once,
+    and a pair whose own rows agree but whose hashes differ is reported and
+    its children compared. With a memo, pairs of subtrees already compared
+    last time are copied from the last result, and their Records keep no
+    match.
+    Inputs:
+        table1: BOMTable of BOM1.
+        rows1: numpy array, index of Record family1, or None.
+        table2: BOMTable of BOM2.
+        rows2: numpy array, index of Record family2, or None.
+        result: DiffResult object to store the comparison result.
+        progress: function progress(rows), called with the number of rows
+                  matched so far every PROGRESS_STEP rows, or None.
+        memo: CompareMemo object, updated when the comparison is done, or
+              None.
+        profiler: Profiler object to count the calls of match and the
+                  families compared, or None.
+        pair: (i, j), the Records of table1 and table2 whose children
+              rows1 and rows2 are, reported before them. -1 for a missing
+              side, the default reports none.
+    Output:
+        result: the same DiffResult object.
+    """
+    matched = 0
+    reported = 0
+    families = 0
+    started = time.perf_counter()
+    subtree1 = table1.fingerprint(table1.compared).tolist()
+    subtree2 = table2.fingerprint(table2.compared).tolist()
+    refs1 = table1.refs
+    refs2 = table2.refs
+    if memo is not None:
+        hashes1 = table1.fingerprint().tolist()
+        hashes2 = table2.fingerprint().tolist()
+        spans = {}
+
+    # each entry is (i, j, children1, children2): the pair of Records to
+    # report, -1 for a missing side, and the families to compare after it.
+    # (None, start, key, None) marks the end of the rows of pair key.
+    stack = [(pair[0], pair[1], rows1, rows2)]
+    while stack:
+        i, j, rows1, rows2 = stack.pop()
+        if i is None:
+            spans[rows1] = (j, len(result))
+            continue
+        if (memo is not None) and ((i != -1) or (j != -1)) and \
+                ((rows1 is not None) or (rows2 is not None)):
+            key = (None if i == -1 else hashes1[i], \
+                   None if j == -1 else hashes2[j])
+            if memo.reuse(key, result, spans):
+                continue
+            stack.append((None, len(result), key, None))
+
+        if (i == -1) and (j != -1):
+            result.add_new(table2.record(j))
+        elif (i != -1) and (j == -1):
+            result.add_removed(table1.record(i))
+        elif i != -1:
+            result.add_changed(table1.record(i), table2.record(j))
+
+        if (rows1 is None) and (rows2 is None):
+            continue
+        families += 1
+        if profiler is None:
+            match(table1, rows1, table2, rows2)
+        else:
+            start = time.perf_counter()
+            match(table1, rows1, table2, rows2)
+            profiler.call("match", time.perf_counter()-start)
+
+        if progress is not None:
+            matched += (0 if rows1 is None else len(rows1)) + \
+                       (0 if rows2 is None else len(rows2))
+            if matched-reported >= PROGRESS_STEP:
+                reported = matched
+                progress(matched)
+
+        steps = get_steps(table1, rows1, table2, rows2, subtree1, subtree2, \
+                          refs1, refs2)
+        # reversed, so the first step of this level is handled first
+        stack.extend(reversed(steps))
+
+    if memo is not None:
+        memo.update(result, spans)
+    if profiler is not None:
+        profiler.call("get_compare", time.perf_counter()-started, families)
+    return result
+
+
+def default_name(path1, path2):
+    """name of the report file when none is given."""
+    return os.path.splitext(os.path.basename(path1))[0] + "_" + \
+           os.path.splitext(os.path.basename(path2))[0] + "_cmp.xlsx"
+
+
+def compare_tables(table1, table2, file_name, progress=no_progress, \
+                   memo=None, profiler=None, engine="tree", workers=None):
+    """compare two BOMTables and write the report.
+    Inputs:
+        table1: BOMTable of old BOM.
+        table2: BOMTable of new BOM.
+        file_name: string, name of the file to be generated.
+        progress: progress callback, see main.
+        memo: CompareMemo object of the last comparison, or None.
+        profiler: Profiler object, or None. If its sheet flag is set, the
+                  stages so far are added to the xlsx report as sheet
+                  "Timing".
+        engine: "tree" to walk both BOMs with get_compare, "merge" to diff
+                them level by level with merge_compare, or "shard" to walk
+                the level 1 subtrees in worker processes with
+                shard_compare. All give the same result, the memo is only
+                used by "tree".
+        workers: number of worker processes of "shard", None for one per
+                 CPU.
+    Output:
+        result: DiffResult object, a closed ReportWriter if memo is None.
+    """
+    total = max(len(table1)+len(table2), 1)
+    progress("Building BOM Trees", 0, 60)
+    ancester1, ancester2 = get_ancester(table1, table2)
+    # parse Ref Des and hash subtrees here, so that the stage shows the cost
+    for table in (table1, table2):
+        table.fingerprint(table.compared)
+    if profiler is not None:
+        for name, value in encoding_figures((table1, table2)).items():
+            profiler.note(name, value)
+    progress("Matching Items", 0, 65)
+
+    # rows go to the report file as they are found, unless the memo has to
+    # keep them for the next comparison
+    if memo is None:
+        result = open_report(file_name)
+    else:
+        result = DiffResult()
+    matching = \
+        lambda rows: progress("Matching Items", rows, 65+25*rows//total)
+    try:
+        if engine == "merge":
+            start = time.perf_counter()
+            merge_compare(table1, ancester1, table2, ancester2, result, \
+                          matching)
+            if profiler is not None:
+                profiler.call("merge_compare", time.perf_counter()-start)
+        elif engine == "shard":
+            # shard imports this module
+            from .shard import shard_compare
+            start = time.perf_counter()
+            shard_compare(table1, ancester1, table2, ancester2, result, \
+                          matching, workers)
+            if profiler is not None:
+                profiler.call("shard_compare", time.perf_counter()-start)
+        else:
+            get_compare(table1, ancester1, table2, ancester2, result, \
+                        matching, memo, profiler)
+        progress("Writing Report", len(result), 90)
+    except BaseException:
+        if memo is None:
+            result.discard()
+        raise
+    sheets = []
+    if (profiler is not None) and profiler.sheet:
+        sheets.append((PROFILE_SHEET, PROFILE_COLUMNS, profiler.rows()))
+    if memo is None:
+        for sheet in sheets:
+            result.add_sheet(*sheet)
+        result.close()
+    else:
+        write_report(result, file_name, sheets)
+    progress("Done", len(result), 100)
+    return result
+
+
+def main(path1, path2, simple, file_name=None, workers=None, cache=None, \
+         progress=no_progress, memo=None, profile=None, \
+         profile_sheet=False, engine="tree", tables=None):
+    """generate comparison results.
+    Inputs:
+        path1: string, path of old BOM.
+        path2: string, path of new BOM.
+        simple: flag for BOM format. True for simple, False for standard.
+        file_name: string, name of the file to be generated.
+        workers: number of processes to read the BOMs, see load_tables,
+                 and to compare them with engine "shard".
+        cache: BOMCache object to reuse parsed BOMs, None to parse them.
+        progress: function progress(stage, rows, percent), called as each
+                  stage starts and ends and while items are matched, with
+                  the rows handled in the stage and the overall percent.
+                  It may raise Cancelled to stop the comparison.
+        memo: CompareMemo object kept from one comparison to the next, so
+              only the changed subtrees are compared again, or None.
+        profile: string, path of a JSON report of the time, peak memory and
+                 rows of each stage, and of the calls of match. "1" writes
+                 it next to the report, as REPORT_timing.json. None takes
+                 the environment variable BOMCOMPARER_PROFILE, and no timing
+                 if it is not set.
+        profile_sheet: flag, True to add the timing to an xlsx report as
+                       sheet "Timing" too.
+        engine: "tree", "merge" or "shard", see compare_tables.
+        tables: TableMemo object holding BOMs read ahead of time, or None.
+                BOMs not found there are read into it, one after another.
+    """
+    # set output file name
+    if file_name is None:
+        file_name = default_name(path1, path2)
+
+    # time the stages if asked for
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV) or None
+    if profile == "1":
+        profile = os.path.splitext(file_name)[0] + "_timing.json"
+    profiler = None
+    if profile is not None:
+        profiler = Profiler(profile_sheet)
+        progress = profiler.wrap(progress)
+
+    # import BOM content from excel file into typed columns
+    stages = ("Loading Original BOM", "Loading Updated BOM")
+    def loaded(i, table):
+        progress(stages[i], len(table), 30*(i+1))
+        if i+1 < len(stages):
+            progress(stages[i+1], 0, 30*(i+1))
+    progress(stages[0], 0, 0)
+    if tables is None:
+        table1, table2 = load_tables([path1, path2], simple, workers, cache, \
+                                     loaded)
+    else:
+        table1 = tables.load(path1, simple, cache)
+        loaded(0, table1)
+        table2 = tables.load(path2, simple, cache)
+        loaded(1, table2)
+
+    # compare level by level, and store result in excel file
+    compare_tables(table1, table2, file_name, progress, memo, profiler, \
+                   engine, workers)
+    if profiler is not None:
+        profiler.finish()
+        profiler.save(profile)
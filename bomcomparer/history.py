@@ -0,0 +1,126 @@
+"""Compare N revisions of a BOM in one pass."""
+import os
+import numpy as np
+
+from .table import get_ancester
+from .reader import get_series, load_tables
+from .report import DiffResult
+from .compare import get_compare
+
+# kinds of change in the change matrix, in the order they are listed
+CHANGES = ("added", "removed", "item", "qty", "ref")
+
+
+def compare_history(tables):
+    """diff every revision against the next one.
+    Each table is matched against both of its neighbours, so the Item
+    Series/Item Number indexes of its sibling groups are cached on the
+    table and reused by the second comparison.
+    Input:
+        tables: list of BOMTable, in revision order.
+    Output:
+        results: list of DiffResult, results[k] compares tables[k] with
+                 tables[k+1].
+    """
+    for table in tables[1:-1]:
+        table.families = {}
+
+    results = []
+    for table1, table2 in zip(tables[:-1], tables[1:]):
+        ancester1, ancester2 = get_ancester(table1, table2)
+        results.append(get_compare(table1, ancester1, table2, ancester2, \
+                                   DiffResult()))
+
+    for table in tables[1:-1]:
+        table.families = None
+    return results
+
+
+def change_matrix(results):
+    """item-by-revision matrix of changes.
+    Input:
+        results: list of DiffResult, as returned by compare_history.
+    Output:
+        matrix: dict, Item Series -> list with one set of changes per
+                result, drawn from CHANGES: "added", "removed", "item"
+                (Item Number changed), "qty" and "ref".
+    """
+    matrix = {}
+    for k, result in enumerate(results):
+        items = [itm1 if itm2 is None else itm2 \
+                 for itm1, itm2 in zip(result.itm1, result.itm2)]
+        series = get_series(np.asarray(items, dtype="object"))
+        for i, nme in enumerate(series):
+            if result.itm1[i] is None:
+                change = {"added"}
+            elif result.itm2[i] is None:
+                change = {"removed"}
+            else:
+                change = set()
+                if result.itm1[i] != result.itm2[i]:
+                    change.add("item")
+                if result.qty1[i] != result.qty2[i]:
+                    change.add("qty")
+                if result.ref1[i] != result.ref2[i]:
+                    change.add("ref")
+            if change:
+                row = matrix.setdefault(nme, [set() for _ in results])
+                row[k].update(change)
+    return matrix
+
+
+def write_history(results, matrix, paths, file_name):
+    """store history comparison in excel file.
+    One sheet lists the revisions, one sheet per consecutive pair holds its
+    comparison result, and sheet "Change Matrix" has one row per Item
+    Series and one column per revision from the second on.
+    Inputs:
+        results: list of DiffResult, as returned by compare_history.
+        matrix: dict, as returned by change_matrix.
+        paths: list of string, paths of the revisions.
+        file_name: string, name of the file to be generated.
+    """
+    import pandas as pd
+    labels = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    rows = sorted(matrix)
+    columns = {}
+    for k, label in enumerate(labels[1:]):
+        columns["%d: %s" % (k+2, label)] = \
+            [", ".join(x for x in CHANGES if x in matrix[nme][k]) \
+             for nme in rows]
+
+    with pd.ExcelWriter(file_name) as writer:
+        pd.DataFrame({"Revision": range(1, len(paths)+1), "BOM": labels, \
+                      "Path": paths}).to_excel(writer, index=False, \
+                                               sheet_name="Revisions")
+        for k, result in enumerate(results):
+            result.to_frame().to_excel(writer, index=False, \
+                sheet_name="Rev %d vs Rev %d" % (k+1, k+2))
+        pd.DataFrame(columns, index=pd.Index(rows, name="Item Series")) \
+            .to_excel(writer, sheet_name="Change Matrix")
+
+
+def history(paths, simple, file_name=None, workers=None, cache=None):
+    """compare N revisions of a BOM, loading each revision once.
+    Inputs:
+        paths: list of string, paths of the revisions, oldest first.
+        simple: flag for BOM format. True for simple, False for standard.
+        file_name: string, name of the file to be generated.
+        workers: number of processes to read the BOMs, see load_tables.
+        cache: BOMCache object to reuse parsed BOMs, None to parse them.
+    Outputs:
+        results: list of DiffResult of consecutive revisions.
+        matrix: dict, as returned by change_matrix.
+    """
+    if len(paths) < 2:
+        raise ValueError("History comparison needs at least two BOMs.")
+    if file_name is None:
+        file_name = os.path.splitext(os.path.basename(paths[0]))[0] + "_" + \
+                    os.path.splitext(os.path.basename(paths[-1]))[0] + \
+                    "_history.xlsx"
+
+    tables = load_tables(paths, simple, workers, cache)
+    results = compare_history(tables)
+    matrix = change_matrix(results)
+    write_history(results, matrix, paths, file_name)
+    return results, matrix
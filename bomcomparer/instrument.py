@@ -0,0 +1,120 @@
+"""Timing of the stages of a comparison, switched on by main(profile=...)
+or by the environment variable BOMCOMPARER_PROFILE.
+"""
+import sys
+import json
+import time
+
+# environment variable naming the JSON timing report, "1" for the default
+PROFILE_ENV = "BOMCOMPARER_PROFILE"
+# sheet of the timing summary in the xlsx report, and its columns
+PROFILE_SHEET = "Timing"
+PROFILE_COLUMNS = ["Stage", "Seconds", "Rows", "Peak RSS (MB)", "Calls"]
+
+
+def peak_rss():
+    """peak resident memory of the process so far in MB, None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on OS X, KB elsewhere
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+class Profiler(object):
+    """record wall time, peak RSS and row count of each stage, call counts
+    and cumulative time of the hot functions, and figures of the run.
+    Stages are the ones main reports to its progress callback: wrap the
+    callback with wrap(), and a stage ends when the next one starts.
+    """
+
+    def __init__(self, sheet=False):
+        """constructor for Profiler class.
+        Input:
+            sheet: flag, True to add the timing to the xlsx report as well.
+        """
+        super().__init__()
+        self.sheet = sheet
+        self.start = time.perf_counter()
+        self.stages = []
+        # name -> [number of calls, seconds]
+        self.calls = {}
+        # name -> number, such as the size of the string vocabulary
+        self.figures = {}
+        self.current = None
+
+
+    def wrap(self, progress):
+        """progress callback that records stages, then calls progress."""
+        def report(stage, rows, percent):
+            self.mark(stage, rows)
+            progress(stage, rows, percent)
+        return report
+
+
+    def mark(self, stage, rows):
+        """start a stage, or update the rows of the running one."""
+        now = time.perf_counter()
+        if (self.current is not None) and (self.current["stage"] == stage):
+            self.current["rows"] = max(self.current["rows"], rows)
+            return
+        self.finish(now)
+        self.current = {"stage": stage, "start": now, "rows": rows}
+
+
+    def finish(self, now=None):
+        """end the running stage."""
+        if self.current is None:
+            return
+        if now is None:
+            now = time.perf_counter()
+        stage = self.current
+        self.current = None
+        self.stages.append({"stage": stage["stage"], \
+                            "seconds": now-stage["start"], \
+                            "rows": stage["rows"], \
+                            "peak_rss_mb": peak_rss()})
+
+
+    def call(self, name, seconds, count=1):
+        """add calls of a function and the time spent in them."""
+        total = self.calls.setdefault(name, [0, 0.0])
+        total[0] += count
+        total[1] += seconds
+
+
+    def note(self, name, value):
+        """record a figure of the run."""
+        self.figures[name] = value
+
+
+    def to_dict(self):
+        """timing report as a dict, see save."""
+        return {"total_seconds": time.perf_counter()-self.start, \
+                "peak_rss_mb": peak_rss(), \
+                "stages": list(self.stages), \
+                "calls": {name: {"count": count, "seconds": seconds} \
+                          for name, (count, seconds) in self.calls.items()}, \
+                "figures": dict(self.figures)}
+
+
+    def rows(self):
+        """timing report as rows of the summary sheet."""
+        rows = [[x["stage"], x["seconds"], x["rows"], x["peak_rss_mb"], \
+                 None] for x in self.stages]
+        rows.extend([name + "()", seconds, None, None, count] \
+                    for name, (count, seconds) in self.calls.items())
+        rows.extend([name, None, value, None, None] \
+                    for name, value in self.figures.items())
+        return rows
+
+
+    def save(self, path):
+        """write the timing report as JSON.
+        Input:
+            path: string, path of the JSON file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,269 @@
+"""Whole-BOM diff done level by level with array operations.
+Gives the same result as get_compare, without walking the sibling groups
+one at a time in python.
+"""
+import numpy as np
+
+from .table import VOCABULARY
+from .refdes import diff_refs
+from .report import DiffResult
+
+
+def get_children(table, rows, steps):
+    """children of many Records at once.
+    Inputs:
+        table: BOMTable object.
+        rows: numpy array of Record index, -1 for no Record.
+        steps: numpy array, group id given to the children of each Record.
+    Outputs:
+        group: numpy array, group id of each child.
+        child: numpy array, index of each child, grouped like rows.
+    """
+    valid = rows >= 0
+    rows = rows[valid]
+    start = table.child_start[rows]
+    count = table.child_start[rows+1] - start
+    offset = np.cumsum(count) - count
+    child = table.child_indices[np.repeat(start-offset, count) + \
+                                np.arange(count.sum())]
+    return np.repeat(steps[valid], count), child
+
+
+def get_position(group, size):
+    """position of each row within its group, rows sorted by group."""
+    start = np.zeros(size+1, dtype="int")
+    np.cumsum(np.bincount(group, minlength=size), out=start[1:])
+    return np.arange(len(group)) - start[group]
+
+
+def find_first(keys, wanted):
+    """position of the first row with each wanted key, -1 if none.
+    Inputs:
+        keys: numpy array of int64 keys of the rows searched.
+        wanted: numpy array of int64 keys to look for.
+    Output:
+        numpy array of positions in keys.
+    """
+    unique, first = np.unique(keys, return_index=True)
+    if len(unique) == 0:
+        return np.full(len(wanted), -1, dtype="int")
+    found = np.searchsorted(unique, wanted)
+    found[found == len(unique)] = 0
+    return np.where(unique[found] == wanted, first[found], -1)
+
+
+def count_keys(keys, wanted):
+    """number of rows of keys equal to each wanted key."""
+    unique, count = np.unique(keys, return_counts=True)
+    if len(unique) == 0:
+        return np.zeros(len(wanted), dtype="int")
+    found = np.searchsorted(unique, wanted)
+    found[found == len(unique)] = 0
+    return np.where(unique[found] == wanted, count[found], 0)
+
+
+def match_groups(series, number, series_other, number_other):
+    """match rows of every group against the rows of the same group in the
+    other BOM, by the rules of match.
+    Inputs:
+        series, number: numpy arrays of int64 keys of the rows, combining
+                        the group with Item Series or Item Number.
+        series_other, number_other: the same keys for the other BOM.
+    Output:
+        numpy array, position of the matched row in the other BOM's rows,
+        -1 for none.
+    """
+    # duplicate Item Series on either side fall back on the Item Number
+    duplicate = (count_keys(series, series) > 1) | \
+                (count_keys(series_other, series) > 1)
+    by_series = find_first(series_other, series)
+    by_number = find_first(number_other, number)
+    return np.where(duplicate, by_number, by_series)
+
+
+def merge_compare(table1, rows1, table2, rows2, result, progress=None):
+    """compare two Record families together with all their descendants,
+    one level of both BOMs at a time.
+    Rows of a level are grouped by the pair of parents they belong to, and
+    every row gets a key of its group and its Item Series, or Item Number.
+    Both BOMs are then joined on these keys with sorted searches, so each
+    level is matched in a few array operations. Added, removed and changed
+    rows are masks over the joined rows. Each reported row keeps its rank
+    among its siblings, and sorting the chains of ranks gives the order of
+    get_compare, which is the order of the result.
+    Inputs:
+        table1: BOMTable of BOM1.
+        rows1: numpy array, index of Record family1.
+        table2: BOMTable of BOM2.
+        rows2: numpy array, index of Record family2.
+        result: DiffResult object to store the comparison result.
+        progress: function progress(rows), called with the number of rows
+                  matched so far after each level, or None.
+    Output:
+        result: the same DiffResult object.
+    """
+    # codes of both BOMs come from one vocabulary
+    series1 = table1.nme.astype("int64")
+    series2 = table2.nme.astype("int64")
+    number1 = table1.itm.astype("int64")
+    number2 = table2.itm.astype("int64")
+    width = max(len(VOCABULARY), 1)
+    subtree1 = table1.fingerprint(table1.compared)
+    subtree2 = table2.fingerprint(table2.compared)
+    refs1 = table1.refs
+    refs2 = table2.refs
+
+    # rows of the current level, by group, and the groups of the level
+    group1 = np.zeros(len(rows1), dtype="int64")
+    group2 = np.zeros(len(rows2), dtype="int64")
+    rows1 = np.asarray(rows1, dtype="int")
+    rows2 = np.asarray(rows2, dtype="int")
+    groups = 1
+    # steps of every level: (parent step, rank, i, j)
+    levels = []
+    matched = 0
+    while (len(rows1) > 0) or (len(rows2) > 0):
+        match1 = match_groups(group1*width + series1[rows1], \
+                              group1*width + number1[rows1], \
+                              group2*width + series2[rows2], \
+                              group2*width + number2[rows2])
+        match2 = match_groups(group2*width + series2[rows2], \
+                              group2*width + number2[rows2], \
+                              group1*width + series1[rows1], \
+                              group1*width + number1[rows1])
+        position1 = get_position(group1, groups)
+        position2 = get_position(group2, groups)
+        width2 = np.bincount(group2, minlength=groups)
+
+        # Records only in BOM2 come first in their group, then BOM1's
+        new = match2 == -1
+        paired = match1 >= 0
+        other = np.full(len(rows1), -1, dtype="int")
+        other[paired] = rows2[match1[paired]]
+        changed = np.zeros(len(rows1), dtype="bool")
+        i = rows1[paired]
+        j = other[paired]
+        changed[paired] = (subtree1[i] != subtree2[j]) | \
+                          (table1.itm[i] != table2.itm[j]) | \
+                          (table1.qty[i] != table2.qty[j]) | \
+                          (refs1[i] != refs2[j])
+        step1 = ~paired | changed
+
+        parent = np.concatenate([group2[new], group1[step1]])
+        rank = np.concatenate([position2[new], \
+                               width2[group1[step1]] + position1[step1]])
+        step_i = np.concatenate([np.full(new.sum(), -1, dtype="int"), \
+                                 rows1[step1]])
+        step_j = np.concatenate([rows2[new], other[step1]])
+        levels.append((parent, rank, step_i, step_j))
+
+        matched += len(rows1) + len(rows2)
+        if progress is not None:
+            progress(matched)
+
+        # the children of every step form the groups of the next level
+        steps = np.arange(len(step_i))
+        group1, rows1 = get_children(table1, step_i, steps)
+        group2, rows2 = get_children(table2, step_j, steps)
+        groups = len(steps)
+
+    if not levels:
+        return result
+    step_i, step_j = get_order(levels)
+    result.extend(get_rows(table1, step_i, table2, step_j), 0, len(step_i))
+    return result
+
+
+def get_order(levels):
+    """lay the steps of all levels out in the order of get_compare, each
+    step followed by the steps below it, and sibling steps by rank.
+    The steps in the subtree of every step are counted from the deepest
+    level up, then the position of every step is its parent's, plus one,
+    plus the subtrees of the siblings ranked before it, from the top level
+    down. Every level is sorted once, so time and memory grow with the
+    number of steps, not with steps times levels.
+    Input:
+        levels: list of (parent, rank, step_i, step_j) numpy arrays, one
+                tuple per level, as built by merge_compare.
+    Outputs:
+        step_i: numpy array, index of the Record in BOM1 of every step.
+        step_j: numpy array, index of the Record in BOM2 of every step.
+    """
+    # steps in the subtree of every step of every level
+    sizes = [None]*len(levels)
+    below = np.zeros(len(levels[-1][0]), dtype="int64")
+    for depth in range(len(levels)-1, -1, -1):
+        sizes[depth] = below + 1
+        above = len(levels[depth-1][0]) if depth > 0 else 1
+        below = np.bincount(levels[depth][0], weights=sizes[depth], \
+                            minlength=above).astype("int64")
+
+    total = sum(len(level[0]) for level in levels)
+    step_i = np.empty(total, dtype="int")
+    step_j = np.empty(total, dtype="int")
+    # position of every step of the level above, the top level's parent is
+    # taken to sit just before the first position
+    start = np.full(1, -1, dtype="int64")
+    for (parent, rank, rows_i, rows_j), size in zip(levels, sizes):
+        order = np.lexsort((rank, parent))
+        parent = parent[order]
+        size = size[order]
+        before = np.cumsum(size) - size
+        first = np.ones(len(parent), dtype="bool")
+        first[1:] = parent[1:] != parent[:-1]
+        first = np.maximum.accumulate(np.where(first, \
+                                               np.arange(len(parent)), 0))
+        position = np.empty(len(parent), dtype="int64")
+        position[order] = start[parent] + 1 + before - before[first]
+        step_i[position] = rows_i
+        step_j[position] = rows_j
+        start = position
+    return step_i, step_j
+
+
+def get_rows(table1, step_i, table2, step_j):
+    """rows of comparison result of many steps at once, the same rows as
+    DiffResult.add_new, add_removed and add_changed give.
+    Inputs:
+        table1: BOMTable of BOM1.
+        step_i: numpy array, index of the Record in BOM1, -1 for none.
+        table2: BOMTable of BOM2.
+        step_j: numpy array, index of the Record in BOM2, -1 for none.
+    Output:
+        DiffResult object.
+    """
+    has1 = step_i >= 0
+    has2 = step_j >= 0
+    i = step_i[has1]
+    j = step_j[has2]
+
+    # numbers stay numpy scalars, as in a Record
+    def side(values, present, rows, missing):
+        column = np.full(len(present), missing, dtype="object")
+        picked = np.empty(len(rows), dtype="object")
+        picked[:] = list(values[rows])
+        column[present] = picked
+        return column
+
+    strings = VOCABULARY.decode(np.arange(len(VOCABULARY)))
+    lvl = np.empty(len(step_i), dtype=table1.lvl.dtype)
+    lvl[has1] = table1.lvl[i]
+    lvl[~has1] = table2.lvl[step_j[~has1]]
+    ref1 = side(table1.ref, has1, i, None)
+    ref2 = side(table2.ref, has2, j, None)
+    both = np.flatnonzero(has1 & has2)
+    refs1 = table1.refs[step_i[both]].tolist()
+    refs2 = table2.refs[step_j[both]].tolist()
+    for k, x, y in zip(both.tolist(), refs1, refs2):
+        ref1[k], ref2[k] = diff_refs(x, y)
+
+    return DiffResult.from_columns({"lvl": lvl, \
+        "itm1": side(strings, has1, table1.itm[i], None), \
+        "itm2": side(strings, has2, table2.itm[j], None), \
+        "qty1": side(table1.qty, has1, i, 0), \
+        "qty2": side(table2.qty, has2, j, 0), \
+        "des1": side(strings, has1, table1.des[i], None), \
+        "des2": side(strings, has2, table2.des[j], None), \
+        "ref1": ref1, "ref2": ref2, \
+        "seq1": side(table1.seq, has1, i, None), \
+        "seq2": side(table2.seq, has2, j, None)})
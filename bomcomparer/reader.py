@@ -0,0 +1,338 @@
+"""Read BOM content from excel files, or from columnar files.
+pandas, openpyxl and pyarrow are imported only by the functions that need
+them, so importing this module stays cheap.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from .table import BOMTable
+from .columnar import is_columnar, read_columnar
+
+
+# headers of Level, Item Number, Item Description, Qty, Ref Des, Item Seq
+SIMPLE_HEADER = ("Level", "Number", "Description", "BOM.Qty", "BOM.Ref Des", \
+                 "BOM.Item Seq")
+STANDARD_HEADER = ("Level", "Item Number", "Item Description", "Qty", \
+                   "Ref Des", "Item Seq")
+
+# BOM files smaller than this in total (bytes) are read one after another,
+# since starting worker processes would take longer than reading them
+PARALLEL_MIN_SIZE = 1 << 20
+# Item Numbers up to this long are split into Item Series as one matrix of
+# character codes, longer ones one by one, see get_series
+SERIES_WIDTH = 64
+
+
+def get_index(f, simple):
+    """get the index of starting rows.
+    Inputs:
+        f: pandas Series object.
+        simple: flag for simple BOMs. True means processing simple BOMs.
+    Outputs:
+        idx: start(, end) index of BOM.
+    """
+    # get index of row "BOM"
+    line = f[f.columns[0]]
+    end = 0
+
+    if simple:
+        start = -1
+    else:
+        start = 0
+        while line[start]!="BOM":
+            start = start+1
+
+    # get index of row "Manufacturers"
+    if "Manufacturers" in list(line):
+        end = start+1
+        while line[end]!="Manufacturers":
+            end = end+1
+
+    if end != 0:
+        return start, end
+    return (start,)
+
+
+def get_info(f, idx, simple):
+    """get useful info.
+    Inputs:
+        f: pandas Series object.
+        idx: start(, end) index of BOM.
+        simple: flag of BOM types.
+    Outputs:
+        lvl: numpy array of Level.
+        itm: numpy array of Item Number.
+        des: numpy array of Item Description.
+        qty: numpy array of Qty.
+        ref: numpy array of Ref Des.
+        seq: numpy array of Item Sequence.
+        nme: numpy array of Item Series.
+    """
+    itm = None
+    des = None
+    qty = None
+    ref = None
+    seq = None
+    lvl = None
+    idx1 = idx[0]
+
+    if len(idx) == 2:
+        idx2 = idx[1]
+    else:
+        idx2 = 0
+
+    # catch useful data, start from row "BOM",
+    # (if necessary,) end at row "Manufacturers"
+    # simple BOM fits in a differnet structure
+    if simple:
+        for j in range(0, len(f.columns)):
+            if (lvl is None)&(f.columns[j] == "Level"):
+                lvl = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (itm is None)&(f.columns[j] == "Number"):
+                itm = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (des is None)&(f.columns[j] == "Description"):
+                des = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (qty is None)&(f.columns[j] == "BOM.Qty"):
+                qty = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (ref is None)&(f.columns[j] == "BOM.Ref Des"):
+                ref = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (seq is None)&(f.columns[j] == "BOM.Item Seq"):
+                seq = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+            if (lvl is not None)&(itm is not None)&(des is not None)& \
+                    (qty is not None)&(ref is not None)&(seq is not None):
+                break
+    else:
+        for j in range(0, len(f.columns)):
+            if (lvl is None)&(f[f.columns[j]][idx1+1] == "Level"):
+                lvl = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (itm is None)&(f[f.columns[j]][idx1+1] == "Item Number"):
+                itm = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (des is None)&(f[f.columns[j]][idx1+1] == "Item Description"):
+                des = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (qty is None)&(f[f.columns[j]][idx1+1] == "Qty"):
+                qty = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (ref is None)&(f[f.columns[j]][idx1+1] == "Ref Des"):
+                ref = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+                continue
+            if (seq is None)&(f[f.columns[j]][idx1+1] == "Item Seq"):
+                seq = np.asarray(f[f.columns[j]][(idx1+2):(idx2-2)])
+            if (lvl is not None)&(itm is not None)&(des is not None)& \
+                    (qty is not None)&(ref is not None)&(seq is not None):
+                break
+
+    # the header is sheet row 1, and DataFrame row 0 is sheet row 2
+    rows = np.arange(len(f))[(idx1+2):(idx2-2)] + 2
+    return clean_info(lvl, itm, des, qty, ref, seq, rows)
+
+
+def clean_info(lvl, itm, des, qty, ref, seq, rows=None):
+    """omit blank rows, set data type, and split Item Series.
+    A blank Item Seq is read as 0, a blank Level raises ValueError, since
+    the row cannot be placed in the tree.
+    Inputs:
+        lvl, itm, des, qty, ref, seq: numpy arrays of BOM rows, as sliced
+                                      from the excel file.
+        rows: numpy array, row of the sheet of each BOM row, to name it in
+              errors, or None.
+    Outputs:
+        lvl, itm, des, qty, ref, seq, nme: same as get_info.
+    """
+    # omit blank rows, and set data type
+    valid = np.frompyfunc(type, 1, 1)(np.asarray(itm, dtype="object")) == str
+    blank = valid & np.frompyfunc(is_missing, 1, 1)(lvl).astype("bool")
+    if blank.any():
+        k = int(np.flatnonzero(blank)[0])
+        raise ValueError("Blank Level in " + ("BOM row %d" % (k+1) \
+                         if rows is None else "sheet row %d" % rows[k]))
+    seq = np.where(np.frompyfunc(is_missing, 1, 1)(seq).astype("bool"), 0, \
+                   seq)
+    lvl = lvl[valid].astype("int")
+    itm = np.asarray(itm[valid], dtype="object")
+    des = des[valid]
+    qty = qty[valid].astype("float")
+    ref = np.asarray(ref[valid], dtype="object")
+    seq = seq[valid].astype("int")
+
+    ref = np.where(np.frompyfunc(is_missing, 1, 1)(ref).astype("bool"), "", \
+                   ref)
+
+    # split version number from item number
+    nme = get_series(itm)
+
+    return lvl, itm, des, qty, ref, seq, nme
+
+
+def is_missing(x):
+    """check whether a cell is empty, i.e. None or NaN."""
+    return (x is None) or (x != x)
+
+
+def get_series(itm):
+    """get Item Series of all items at once.
+    Item Series is the part of Item Number before its second "-", or the
+    whole Item Number if it has less than two "-". Item Numbers up to
+    SERIES_WIDTH characters are laid out as a matrix of character codes,
+    every code from the second "-" on is set to 0, and numpy drops these
+    trailing zeros when reading rows back. The few longer ones are split
+    one by one, so that one long Item Number does not widen the matrix.
+    Input:
+        itm: numpy array of Item Number.
+    Output:
+        nme: numpy array of Item Series.
+    """
+    itm = np.asarray(itm, dtype="object")
+    nme = np.empty(len(itm), dtype="object")
+    long = np.fromiter(map(len, itm.tolist()), dtype="int", \
+                       count=len(itm)) > SERIES_WIDTH
+    short = np.flatnonzero(~long)
+    if len(short) > 0:
+        chars = np.asarray(itm[short], dtype="str")
+        codes = chars.view(np.uint32).reshape(len(chars), -1).copy()
+        codes[np.cumsum(codes == ord("-"), axis=1) >= 2] = 0
+        nme[short] = codes.view(chars.dtype).ravel()
+    for i in np.flatnonzero(long).tolist():
+        nme[i] = "-".join(itm[i].split("-", 2)[:2])
+    return nme
+
+
+def load_bom(path, simple):
+    """read BOM content from a xlsx file in one streaming pass.
+    The workbook is opened read-only and rows are read lazily: only the six
+    needed columns are kept, and reading stops at row "Manufacturers".
+    Rows are picked exactly as get_index and get_info do on the DataFrame
+    of pd.read_excel.
+    Inputs:
+        path: string, path of BOM.
+        simple: flag of BOM types.
+    Outputs:
+        lvl, itm, des, qty, ref, seq, nme: same as get_info.
+    """
+    import openpyxl
+    book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        # rows with their sheet row number, which starts at 1
+        rows = enumerate(book.worksheets[0].iter_rows(values_only=True), 1)
+
+        # simple BOM has its header in the first row and skips the next row,
+        # standard BOM has its header right after row "BOM"
+        header = next(rows, (0, ()))[1]
+        if simple:
+            next(rows, None)
+        else:
+            for _, row in rows:
+                if row and (row[0] == "BOM"):
+                    header = next(rows, (0, ()))[1]
+                    break
+            else:
+                raise ValueError("Row 'BOM' not found in " + path)
+        names = SIMPLE_HEADER if simple else STANDARD_HEADER
+        columns = []
+        for name in names:
+            if name not in header:
+                raise ValueError("Column '" + name + "' not found in " + path)
+            columns.append(header.index(name))
+
+        data = []
+        numbers = []
+        blank = 0
+        for number, row in rows:
+            if row and (row[0] == "Manufacturers"):
+                break
+            data.append(tuple(row[j] if j < len(row) else None \
+                              for j in columns))
+            numbers.append(number)
+            blank = 0 if any(x is not None for x in row) else blank+1
+        else:
+            # pd.read_excel drops blank rows at the end of the sheet
+            del data[len(data)-blank:]
+            del numbers[len(numbers)-blank:]
+    finally:
+        book.close()
+
+    # the two rows above "Manufacturers" do not belong to BOM
+    del data[-2:]
+    del numbers[-2:]
+    data = [np.array(column, dtype="object") for column in zip(*data)] \
+           or [np.array([], dtype="object")]*6
+    return clean_info(*data, rows=np.array(numbers, dtype="int"))
+
+
+def read_bom(path, simple):
+    """read BOM content from an excel file.
+    xlsx files are streamed by load_bom, other formats are read by pandas.
+    Inputs:
+        path: string, path of BOM.
+        simple: flag of BOM types.
+    Outputs:
+        lvl, itm, des, qty, ref, seq, nme: same as get_info.
+    """
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        return load_bom(path, simple)
+    import pandas as pd
+    f = pd.read_excel(path)
+    return get_info(f, get_index(f, simple), simple)
+
+
+def load_table(path, simple, cache=None):
+    """read a BOM and store it in a BOMTable.
+    Also runs in worker processes: a BOMTable is pickled with its strings,
+    one object per distinct string so pickle sends each back only once, and
+    encoded again by the receiving process. Arrow and Parquet
+    files written by write_columnar are already parsed, and read as is.
+    Inputs:
+        path: string, path of BOM.
+        simple: flag of BOM types.
+        cache: BOMCache object, or None to always parse the file.
+    Output:
+        BOMTable of the BOM.
+    """
+    if is_columnar(path):
+        return read_columnar(path)
+    if cache is not None:
+        return cache.load(path, simple)
+    return BOMTable(*read_bom(path, simple))
+
+
+def load_tables(paths, simple, workers=None, cache=None, done=None):
+    """read several BOMs, in parallel worker processes when it pays off.
+    Inputs:
+        paths: list of string, paths of BOMs.
+        simple: flag of BOM types.
+        workers: number of worker processes. None means one per BOM, up to
+                 the number of CPUs, 1 reads the BOMs serially.
+        cache: BOMCache object, or None to always parse the files.
+        done: function done(i, table), called as the table of paths[i] is
+              ready, in the order of paths.
+    Output:
+        list of BOMTable, in the order of paths.
+    """
+    if workers is None:
+        workers = min(len(paths), os.cpu_count() or 1)
+    if (workers < 2) or (len(paths) < 2) or \
+            (sum(os.path.getsize(path) for path in paths) < PARALLEL_MIN_SIZE):
+        tables = (load_table(path, simple, cache) for path in paths)
+        return report_tables(tables, done)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return report_tables(pool.map(load_table, paths, \
+                             [simple]*len(paths), [cache]*len(paths)), done)
+
+
+def report_tables(tables, done):
+    """collect tables into a list, calling done(i, table) on each."""
+    collected = []
+    for i, table in enumerate(tables):
+        if done is not None:
+            done(i, table)
+        collected.append(table)
+    return collected
@@ -0,0 +1,169 @@
+"""Reference designators parsed into compact sets of integer codes."""
+import re
+import threading
+import numpy as np
+
+
+# designators of one range, such as R1-R10, are expanded up to this many
+MAX_RANGE = 10000
+# TOKENS is emptied once it holds this many designator texts
+TOKENS_SIZE = 100000
+
+# prefix -> id, shared by all tables of the process so that codes of two
+# BOMs can be compared, and the prefixes by id. New prefixes are added under
+# LOCK, BOMs may be parsed by several threads at once.
+PREFIXES = {}
+PREFIX_NAMES = []
+LOCK = threading.Lock()
+# codes of each designator text parsed so far
+TOKENS = {"": ()}
+
+SEPARATOR = re.compile(r"[,;\s]+")
+# a designator is a prefix and a number without leading zeros, R01 is
+# prefix R0 and number 1 so that the text can be rebuilt exactly
+DESIGNATOR = re.compile(r"^(.*?)([1-9][0-9]*|0)$")
+
+
+def get_code(prefix, number):
+    """code of one designator, the prefix id in the high 32 bits and
+    number+1 in the low ones, 0 for a designator without number."""
+    code = PREFIXES.get(prefix)
+    if code is None:
+        with LOCK:
+            code = PREFIXES.get(prefix)
+            if code is None:
+                code = len(PREFIX_NAMES)
+                PREFIX_NAMES.append(prefix)
+                PREFIXES[prefix] = code
+    return (code << 32) | (0 if number is None else number+1)
+
+
+def clear_refs():
+    """forget all prefixes and parsed designators.
+    Codes parsed before are no longer valid, so call it only once no Ref
+    Des set of this process is in use any more.
+    """
+    with LOCK:
+        PREFIXES.clear()
+        del PREFIX_NAMES[:]
+        TOKENS.clear()
+        TOKENS[""] = ()
+
+
+def split_designator(token):
+    """split a designator into prefix and number, None if it has none."""
+    found = DESIGNATOR.match(token)
+    if (found is None) or (len(found.group(2)) > 9):
+        return token, None
+    return found.group(1), int(found.group(2))
+
+
+def parse_token(token):
+    """codes of one designator, or of all designators of a range such as
+    R1-R10 or R1-10.
+    Input:
+        token: string, one item of Ref Des text.
+    Output:
+        tuple of int codes.
+    """
+    if "-" in token:
+        first, last = token.split("-", 1)
+        prefix, start = split_designator(first)
+        if last.isdigit():
+            last = prefix + last
+        prefix2, end = split_designator(last)
+        if (start is not None) and (end is not None) and \
+                (prefix2 == prefix) and (0 <= end-start < MAX_RANGE):
+            return tuple(get_code(prefix, n) for n in range(start, end+1))
+    return (get_code(*split_designator(token)),)
+
+
+def parse_refs(text):
+    """parse Ref Des text into a sorted set of designator codes.
+    Designators are separated by commas, semicolons or spaces, and ranges
+    are expanded. Designators repeat from one Record to the next, so the
+    codes of each distinct one are kept in TOKENS.
+    Input:
+        text: Ref Des of one Record, a string or any other cell value.
+    Output:
+        numpy array of int64, sorted and unique.
+    """
+    if type(text) is not str:
+        text = "" if (text is None) or (text != text) else str(text)
+    codes = set()
+    for token in SEPARATOR.split(text):
+        found = TOKENS.get(token)
+        if found is None:
+            if len(TOKENS) >= TOKENS_SIZE:
+                TOKENS.clear()
+                TOKENS[""] = ()
+            found = TOKENS[token] = parse_token(token)
+        codes.update(found)
+    return np.array(sorted(codes), dtype="int64")
+
+
+def encode_refs(values):
+    """parse the Ref Des of all Records, each distinct text once.
+    Input:
+        values: numpy array of Ref Des.
+    Output:
+        numpy array of bytes, the codes of each Record's set. Equal sets
+        give equal bytes, whatever the order or ranges of the text.
+    """
+    known = {}
+    sets = np.empty(len(values), dtype="object")
+    for i, text in enumerate(values.tolist()):
+        key = (type(text), text)
+        if key not in known:
+            known[key] = parse_refs(text).tobytes()
+        sets[i] = known[key]
+    return sets
+
+
+def format_refs(codes):
+    """write a set of designator codes as text, runs of three or more
+    designators as ranges, such as "C4,R1-R8".
+    Input:
+        codes: numpy array of int64 codes, or bytes from encode_refs.
+    Output:
+        string.
+    """
+    if type(codes) is bytes:
+        codes = np.frombuffer(codes, dtype="int64")
+    names = []
+    for prefix in sorted(set((codes >> 32).tolist()), \
+                         key=lambda x: PREFIX_NAMES[x]):
+        name = PREFIX_NAMES[prefix]
+        numbers = (codes[(codes >> 32) == prefix] & 0xFFFFFFFF).tolist()
+        if numbers[0] == 0:
+            names.append(name)
+            numbers = numbers[1:]
+        # split sorted numbers into runs of consecutive numbers
+        start = 0
+        for k in range(1, len(numbers)+1):
+            if (k < len(numbers)) and (numbers[k] == numbers[k-1]+1):
+                continue
+            first, last = numbers[start]-1, numbers[k-1]-1
+            if last-first >= 2:
+                names.append("%s%d-%s%d" % (name, first, name, last))
+            else:
+                names.extend(name + str(n) for n in range(first, last+1))
+            start = k
+    return ",".join(names)
+
+
+def diff_refs(refs1, refs2):
+    """designators removed from and added to a set.
+    Inputs:
+        refs1: bytes of the original set, from encode_refs.
+        refs2: bytes of the updated set.
+    Outputs:
+        removed: string, designators only in refs1, see format_refs.
+        added: string, designators only in refs2.
+    """
+    if refs1 == refs2:
+        return "", ""
+    codes1 = np.frombuffer(refs1, dtype="int64")
+    codes2 = np.frombuffer(refs2, dtype="int64")
+    return format_refs(np.setdiff1d(codes1, codes2, assume_unique=True)), \
+           format_refs(np.setdiff1d(codes2, codes1, assume_unique=True))
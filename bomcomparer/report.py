@@ -0,0 +1,352 @@
+"""Comparison results, and report files written as rows come in."""
+import os
+import csv
+
+from .refdes import diff_refs
+
+
+# rows a ReportWriter buffers before writing them out
+FLUSH_ROWS = 4096
+# sheet of the xlsx report
+REPORT_SHEET = "Comparison Report"
+
+
+class DiffResult(object):
+    """container of comparison results.
+    Rows are buffered column by column in python lists, so adding a row costs
+    O(1) instead of copying every column as np.append does. The rows are
+    streamed to the report file by a ReportWriter once the diff is done.
+    """
+    columns = ["Level", "Original Item", "Updated Item", \
+               "Original Qty.", "Updated Qty.", "Original Item Des.", \
+               "Updated Item Des.", "Original Ref. Des.", \
+               "Updated Ref. Des.", "Original Seq.", \
+               "Updated Seq."]
+    # list attribute of each column, in report column order
+    fields = ("lvl", "itm1", "itm2", "qty1", "qty2", "des1", "des2", \
+              "ref1", "ref2", "seq1", "seq2")
+
+    def __init__(self):
+        super().__init__()
+        self.lvl = []
+        self.itm1 = []
+        self.itm2 = []
+        self.qty1 = []
+        self.qty2 = []
+        self.des1 = []
+        self.des2 = []
+        self.ref1 = []
+        self.ref2 = []
+        self.seq1 = []
+        self.seq2 = []
+
+
+    def __len__(self):
+        return len(self.lvl)
+
+
+    def add(self, lvl, itm1, itm2, qty1, qty2, des1, des2, ref1, ref2, \
+            seq1, seq2):
+        """append one row of comparison result."""
+        self.lvl.append(lvl)
+        self.itm1.append(itm1)
+        self.itm2.append(itm2)
+        self.qty1.append(qty1)
+        self.qty2.append(qty2)
+        self.des1.append(des1)
+        self.des2.append(des2)
+        self.ref1.append(ref1)
+        self.ref2.append(ref2)
+        self.seq1.append(seq1)
+        self.seq2.append(seq2)
+
+
+    def add_new(self, unit):
+        """append a Record which only exists in BOM2."""
+        self.add(unit.lvl, None, unit.itm, 0, unit.qty, None, unit.des, \
+                 None, unit.ref, None, unit.seq)
+
+
+    def add_removed(self, unit):
+        """append a Record which only exists in BOM1."""
+        self.add(unit.lvl, unit.itm, None, unit.qty, 0, unit.des, None, \
+                 unit.ref, None, unit.seq, None)
+
+
+    def add_changed(self, unit1, unit2):
+        """append a Record of BOM1 together with its match in BOM2.
+        Only the Ref Des removed from unit1 and added to unit2 are kept.
+        """
+        removed, added = diff_refs(unit1.refs, unit2.refs)
+        self.add(unit1.lvl, unit1.itm, unit2.itm, unit1.qty, unit2.qty, \
+                 unit1.des, unit2.des, removed, added, unit1.seq, unit2.seq)
+
+
+    @classmethod
+    def from_columns(cls, columns):
+        """build a DiffResult from a dict of lists, keyed by fields."""
+        result = cls()
+        for name in cls.fields:
+            setattr(result, name, list(columns[name]))
+        return result
+
+
+    def extend(self, other, start, end):
+        """append rows start to end-1 of another DiffResult."""
+        for name in self.fields:
+            getattr(self, name).extend(getattr(other, name)[start:end])
+
+
+    def to_frame(self):
+        """build the DataFrame of comparison results, in report column order.
+        """
+        import pandas as pd
+        return pd.DataFrame.from_dict(dict(zip(self.columns, \
+            (getattr(self, name) for name in self.fields))))
+
+
+class ReportWriter(DiffResult):
+    """DiffResult that writes its rows to a report file instead of keeping
+    them. Rows are buffered in the column lists and written every FLUSH_ROWS
+    rows, so memory stays flat however long the report is. Pass it to
+    get_compare as the result to write rows as the diff finds them, then
+    close it. Subclasses open temp_name, write one block of rows and finish
+    the file; close then renames it to file_name, so a report already at
+    file_name is only replaced by a complete one.
+    """
+
+    def __init__(self, file_name):
+        """constructor for ReportWriter class.
+        Input:
+            file_name: string, name of the file to be generated.
+        """
+        super().__init__()
+        self.file_name = file_name
+        base, extension = os.path.splitext(file_name)
+        self.temp_name = base + ".tmp%d" % os.getpid() + extension
+        self.written = 0
+        # extra sheets, as (title, header, rows)
+        self.sheets = []
+
+
+    def __len__(self):
+        return self.written + len(self.lvl)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, kind, error, trace):
+        if kind is None:
+            self.close()
+        else:
+            self.discard()
+
+
+    def add(self, *row):
+        """append one row of comparison result, see DiffResult.add."""
+        super().add(*row)
+        if len(self.lvl) >= FLUSH_ROWS:
+            self.flush()
+
+
+    def extend(self, other, start, end):
+        """append rows start to end-1 of another DiffResult, by blocks."""
+        for block in range(start, end, FLUSH_ROWS):
+            super().extend(other, block, min(block+FLUSH_ROWS, end))
+            if len(self.lvl) >= FLUSH_ROWS:
+                self.flush()
+
+
+    def to_frame(self):
+        raise TypeError("Rows of a ReportWriter are in " + self.file_name)
+
+
+    def add_sheet(self, title, header, rows):
+        """add a sheet after the comparison result, written on close.
+        Only xlsx reports have more than one sheet, other ones ignore it.
+        """
+        self.sheets.append((title, header, rows))
+
+
+    def flush(self):
+        """write the buffered rows and empty the buffer."""
+        if len(self.lvl) > 0:
+            self.write([getattr(self, name) for name in self.fields])
+            self.written += len(self.lvl)
+            for name in self.fields:
+                getattr(self, name).clear()
+
+
+    def close(self):
+        """write the remaining rows, finish the file and move it into
+        place."""
+        self.flush()
+        self.finish()
+        os.replace(self.temp_name, self.file_name)
+
+
+    def discard(self):
+        """drop a report left unfinished, such as a cancelled comparison.
+        A file already at file_name is left as it was."""
+        if os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
+
+
+    def write(self, columns):
+        """write one block of rows, given as a list of columns."""
+        raise NotImplementedError
+
+
+    def finish(self):
+        """finish the file once all rows are written."""
+        raise NotImplementedError
+
+
+def get_cell(value):
+    """value of a report cell, None for missing values."""
+    # NaN is the only value not equal to itself
+    if (value is not None) and (value != value):
+        return None
+    return value
+
+
+class XlsxReport(ReportWriter):
+    """xlsx report written by openpyxl in write-only mode, which streams
+    rows to a temporary file instead of building the sheet in memory.
+    """
+
+    def __init__(self, file_name):
+        super().__init__(file_name)
+        from openpyxl import Workbook
+        self.book = Workbook(write_only=True)
+        self.sheet = self.new_sheet(REPORT_SHEET, self.columns)
+
+
+    def new_sheet(self, title, header):
+        """add a sheet to the workbook, with a bold header row."""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        sheet = self.book.create_sheet(title)
+        cells = []
+        for name in header:
+            cell = WriteOnlyCell(sheet, value=name)
+            cell.font = Font(bold=True)
+            cells.append(cell)
+        sheet.append(cells)
+        return sheet
+
+
+    def write(self, columns):
+        for row in zip(*columns):
+            self.sheet.append([get_cell(x) for x in row])
+
+
+    def finish(self):
+        for title, header, rows in self.sheets:
+            sheet = self.new_sheet(title, header)
+            for row in rows:
+                sheet.append([get_cell(x) for x in row])
+        self.book.save(self.temp_name)
+
+
+    def discard(self):
+        # closing the sheets ends their streams, nothing was saved yet
+        for sheet in self.book.worksheets:
+            sheet.close()
+        super().discard()
+
+
+class CsvReport(ReportWriter):
+    """csv report, missing values are left empty."""
+
+    def __init__(self, file_name):
+        super().__init__(file_name)
+        self.file = open(self.temp_name, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+
+
+    def write(self, columns):
+        self.writer.writerows([get_cell(x) for x in row] \
+                              for row in zip(*columns))
+
+
+    def finish(self):
+        self.file.close()
+
+
+    def discard(self):
+        self.file.close()
+        super().discard()
+
+
+class ParquetReport(ReportWriter):
+    """parquet report written by pyarrow, one row group per block of rows.
+    Item Numbers, descriptions and Ref Des are stored as strings, and
+    missing values as nulls.
+    """
+
+    def __init__(self, file_name):
+        super().__init__(file_name)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        kinds = (pa.int32(), pa.string(), pa.string(), pa.float64(), \
+                 pa.float64(), pa.string(), pa.string(), pa.string(), \
+                 pa.string(), pa.int32(), pa.int32())
+        self.schema = pa.schema(list(zip(self.columns, kinds)))
+        self.writer = pq.ParquetWriter(self.temp_name, self.schema)
+
+
+    def write(self, columns):
+        arrays = []
+        for values, field in zip(columns, self.schema):
+            values = [get_cell(x) for x in values]
+            if field.type == self.pa.string():
+                values = [None if x is None else str(x) for x in values]
+            elif field.type == self.pa.int32():
+                values = [None if x is None else int(x) for x in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, \
+                                                          schema=self.schema))
+
+
+    def finish(self):
+        self.writer.close()
+
+
+    def discard(self):
+        self.writer.close()
+        super().discard()
+
+
+# report writer of each file extension, xlsx for any other extension
+REPORT_TYPES = {".csv": CsvReport, ".parquet": ParquetReport, \
+                ".pq": ParquetReport}
+
+
+def open_report(file_name):
+    """open a ReportWriter, of the type given by the file extension.
+    Input:
+        file_name: string, name of the file to be generated, .xlsx, .csv or
+                   .parquet.
+    Output:
+        ReportWriter object.
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    return REPORT_TYPES.get(extension, XlsxReport)(file_name)
+
+
+def write_report(result, file_name, sheets=()):
+    """store comparison result in a report file.
+    Inputs:
+        result: DiffResult object.
+        file_name: string, name of the file to be generated, see open_report.
+        sheets: list of extra sheets as (title, header, rows), see add_sheet.
+    """
+    with open_report(file_name) as report:
+        report.extend(result, 0, len(result))
+        for sheet in sheets:
+            report.add_sheet(*sheet)
@@ -0,0 +1,127 @@
+"""Diff the level 1 subtrees of two BOMs in parallel worker processes."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from .report import DiffResult
+from .shared import SharedStore, attach_store
+from .compare import match, get_steps, get_compare
+
+
+# subtrees are cut into about this many shards per worker, so that one big
+# subtree does not leave the other workers idle at the end
+SHARDS_PER_WORKER = 4
+# changed subtrees holding fewer rows than this in total are compared in
+# this process, since starting workers would take longer
+SHARD_MIN_ROWS = 20000
+
+# the two BOMTables of a worker process, set by attach_tables
+TABLES = None
+
+
+def attach_tables(handle):
+    """worker initializer, attach to the SharedStore of both tables."""
+    global TABLES
+    store = attach_store(handle)
+    TABLES = (store.table(0), store.table(1))
+
+
+def diff_steps(table1, table2, steps, result):
+    """compare each pair of steps with the subtrees below it."""
+    for i, j in steps:
+        get_compare(table1, None if i == -1 else table1.children(i), \
+                    table2, None if j == -1 else table2.children(j), \
+                    result, pair=(i, j))
+    return result
+
+
+def diff_shard(steps):
+    """worker task, compare a run of steps into a new DiffResult."""
+    table1, table2 = TABLES
+    return diff_steps(table1, table2, steps, DiffResult())
+
+
+def get_sizes(table, rows, steps, side):
+    """rows in the subtree of each step on one side, up to the next Record
+    of the family."""
+    if rows is None:
+        return np.zeros(len(steps), dtype="int")
+    ends = np.append(rows[1:], len(table))
+    found = np.array([step[side] for step in steps], dtype="int")
+    sizes = ends[np.searchsorted(rows, found).clip(0, len(rows)-1)] - found
+    sizes[found == -1] = 0
+    return sizes
+
+
+def split_steps(steps, sizes, shards):
+    """cut steps into runs of about the same number of rows, in order.
+    Outputs:
+        runs: list of list of (i, j).
+        done: list, rows compared once each run is done.
+    """
+    if not steps:
+        return [], []
+    bounds = np.cumsum(sizes)
+    total = int(bounds[-1])
+    cuts = np.searchsorted(bounds, np.arange(1, shards)*total/shards, \
+                           side="right")
+    cuts = sorted(set(np.append(cuts, len(steps)).tolist()) - {0})
+    runs = []
+    start = 0
+    for end in cuts:
+        runs.append([(i, j) for i, j, _, _ in steps[start:end]])
+        start = end
+    return runs, bounds[np.array(cuts)-1].tolist()
+
+
+def shard_compare(table1, rows1, table2, rows2, result, progress=None, \
+                  workers=None):
+    """compare two Record families like get_compare, in worker processes.
+    The families are matched here, then the changed pairs are cut into
+    shards of consecutive pairs, and each shard is compared with all the
+    subtrees below it by a worker process. Workers read both tables from
+    one SharedStore, and their rows are added to result in the
+    order of the shards, which is the order of get_compare.
+    Inputs:
+        table1: BOMTable of BOM1.
+        rows1: numpy array, index of Record family1, or None.
+        table2: BOMTable of BOM2.
+        rows2: numpy array, index of Record family2, or None.
+        result: DiffResult object to store the comparison result.
+        progress: function progress(rows), called with the number of rows
+                  compared so far as each shard is done, or None.
+        workers: number of worker processes, None for one per CPU. Fewer
+                 than 2 compares the shards in this process, as do small
+                 diffs, see SHARD_MIN_ROWS.
+    Output:
+        result: the same DiffResult object.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if (rows1 is None) and (rows2 is None):
+        return result
+    match(table1, rows1, table2, rows2)
+    steps = get_steps(table1, rows1, table2, rows2, \
+                      table1.fingerprint(table1.compared), \
+                      table2.fingerprint(table2.compared), \
+                      table1.refs, table2.refs)
+    sizes = get_sizes(table1, rows1, steps, 0) + \
+            get_sizes(table2, rows2, steps, 1)
+    shards, done = split_steps(steps, sizes, workers*SHARDS_PER_WORKER)
+    if (workers < 2) or (len(shards) < 2) or \
+            (sum(sizes.tolist()) < SHARD_MIN_ROWS):
+        for shard, rows in zip(shards, done):
+            diff_steps(table1, table2, shard, result)
+            if progress is not None:
+                progress(rows)
+        return result
+
+    with SharedStore.create((table1, table2)) as store, \
+            ProcessPoolExecutor(max_workers=min(workers, len(shards)), \
+                                initializer=attach_tables, \
+                                initargs=(store.handle,)) as pool:
+        for shard, rows in zip(pool.map(diff_shard, shards), done):
+            result.extend(shard, 0, len(shard))
+            if progress is not None:
+                progress(rows)
+    return result
@@ -0,0 +1,214 @@
+"""BOMTables kept in shared memory, for worker processes to attach to.
+multiprocessing.shared_memory needs Python 3.8, it is imported only by the
+functions that use it, so importing this module works on older versions.
+"""
+import os
+import pickle
+from collections import namedtuple
+import numpy as np
+
+from .table import BOMTable, Vocabulary, VOCABULARY
+from .refdes import PREFIX_NAMES, get_code
+
+
+# numeric columns stored as they are, VOCABULARY codes among them
+NUMBERS = ("lvl", "qty", "seq", "parent", "child_start", "child_indices") + \
+          BOMTable.encoded
+# object columns stored as int32 codes into the vocabulary of the store
+OBJECTS = ("ref", "refs")
+
+# what a worker needs to attach to a SharedStore: the name of the segment,
+# the (column, dtype, offset, length) of every column of each table, and the
+# (offset, length) of the pickled vocabulary, VOCABULARY codes and Ref Des
+# prefixes
+SharedHandle = namedtuple("SharedHandle", ("name", "layout", "vocab"))
+
+# stores attached by this process, by segment name, see attach_store
+ATTACHED = {}
+
+
+class SharedStore(object):
+    """BOMTables whose columns live in one shared memory segment.
+    Level, Qty, Item Sequence, the VOCABULARY codes of Item Number, Item
+    Series and Item Description, the parent and child offset tables and the
+    subtree fingerprints are stored as typed arrays; Ref Des and Ref Des
+    sets as int32 codes into one vocabulary of all the tables. That
+    vocabulary is stored pickled in the segment, with the strings of the
+    VOCABULARY codes used and the Ref Des prefixes the sets refer to.
+    Build a store with create in one process and pass its handle, a few
+    hundred bytes, to workers, which attach to it: numeric columns are read
+    in place, and only the object columns are decoded, once per process.
+    VOCABULARY codes are read in place too when the worker gives the same
+    codes to the strings, as a worker forked after the BOMs were read does,
+    and translated otherwise.
+    Fingerprints are computed by the creating process, so the tables of a
+    store can be compared with each other in any process.
+    """
+
+    def __init__(self, segment, handle, owner):
+        """constructor for SharedStore class, see create and attach.
+        Inputs:
+            segment: SharedMemory object.
+            handle: SharedHandle of the store.
+            owner: flag, True if close also frees the segment.
+        """
+        super().__init__()
+        self.segment = segment
+        self.handle = handle
+        self.owner = owner
+        self.values = None
+        # codes of this process by code of the creating one, None if they
+        # are the same
+        self.codes = None
+        # True when Ref Des sets can be used as they are, see table
+        self.same_prefixes = None
+        self.tables = [None]*len(handle.layout)
+
+
+    @classmethod
+    def create(cls, tables):
+        """copy BOMTables into a new shared memory segment.
+        Input:
+            tables: list of BOMTable.
+        Output:
+            SharedStore object owning the segment.
+        """
+        from multiprocessing import shared_memory
+        # object columns of all tables share one vocabulary of the store
+        objects = Vocabulary()
+        arrays = []
+        for table in tables:
+            columns = {name: objects.encode(getattr(table, name)) \
+                       for name in OBJECTS}
+            columns.update((name, np.asarray(getattr(table, name))) \
+                           for name in NUMBERS)
+            columns["subtree"] = table.fingerprint(table.compared)
+            arrays.append(columns)
+        used = np.unique(np.concatenate([np.zeros(0, dtype="int32")] + \
+            [getattr(table, name) for table in tables \
+             for name in BOMTable.encoded]))
+        vocab = pickle.dumps((objects.values, used, \
+                              VOCABULARY.decode(used).tolist(), \
+                              list(PREFIX_NAMES)), \
+                             protocol=pickle.HIGHEST_PROTOCOL)
+
+        # every column starts on 8 bytes, the vocabulary goes last
+        layout = []
+        size = 0
+        for columns in arrays:
+            placed = []
+            for name, column in columns.items():
+                size = (size+7) & ~7
+                placed.append((name, column.dtype.str, size, len(column)))
+                size += column.nbytes
+            layout.append(tuple(placed))
+
+        segment = shared_memory.SharedMemory(create=True, \
+                                             size=max(size+len(vocab), 1))
+        for columns, placed in zip(arrays, layout):
+            for name, dtype, offset, length in placed:
+                target = np.ndarray(length, dtype=dtype, \
+                                    buffer=segment.buf, offset=offset)
+                target[:] = columns[name]
+                del target
+        segment.buf[size:size+len(vocab)] = vocab
+        handle = SharedHandle(segment.name, tuple(layout), \
+                              (size, len(vocab)))
+        return cls(segment, handle, True)
+
+
+    @classmethod
+    def attach(cls, handle):
+        """open the store of a handle made by another process."""
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(name=handle.name), handle, \
+                   False)
+
+
+    def __len__(self):
+        return len(self.tables)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, kind, error, trace):
+        self.close()
+
+
+    def table(self, k):
+        """get BOMTable k of the store, built over the segment once.
+        Ref Des sets hold the prefix ids of the creating process, so they
+        are parsed again from Ref Des unless this process gives the same
+        ids to the prefixes.
+        """
+        if self.tables[k] is not None:
+            return self.tables[k]
+        if self.values is None:
+            start, length = self.handle.vocab
+            values, used, strings, prefixes = \
+                pickle.loads(self.segment.buf[start:start+length])
+            self.values = np.empty(len(values), dtype="object")
+            self.values[:] = values
+            codes = VOCABULARY.encode(strings)
+            if np.array_equal(codes, used):
+                self.codes = None
+            else:
+                self.codes = np.zeros(used.max(initial=0)+1, dtype="int32")
+                self.codes[used] = codes
+            self.same_prefixes = all((get_code(prefix, None) >> 32) == i \
+                                     for i, prefix in enumerate(prefixes))
+
+        columns = {}
+        for name, dtype, offset, length in self.handle.layout[k]:
+            column = np.ndarray(length, dtype=dtype, \
+                                buffer=self.segment.buf, offset=offset)
+            if name in OBJECTS:
+                column = self.values[column]
+            elif (name in BOMTable.encoded) and (self.codes is not None):
+                column = self.codes[column]
+            columns[name] = column
+        table = BOMTable.from_columns(columns)
+        table.hashes[BOMTable.compared] = columns["subtree"]
+        if self.same_prefixes:
+            table.ref_sets = columns["refs"]
+        self.tables[k] = table
+        return table
+
+
+    def close(self):
+        """drop the tables and close the segment, freeing it if it is
+        owned."""
+        self.tables = [None]*len(self.tables)
+        self.values = None
+        self.codes = None
+        try:
+            self.segment.close()
+        except BufferError:
+            # tables handed out still use the segment, it is closed with
+            # this process
+            pass
+        if self.owner:
+            self.segment.unlink()
+            self.owner = False
+
+
+def share_tracker():
+    """start the resource tracker of this process, if it has one.
+    Call it before starting worker processes that attach to stores created
+    later: workers then report segments to this tracker, instead of starting
+    their own, which would free the segments as soon as they exit.
+    """
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+
+
+def attach_store(handle):
+    """get the SharedStore of a handle, attached once per process."""
+    store = ATTACHED.get(handle.name)
+    if store is None:
+        store = SharedStore.attach(handle)
+        ATTACHED[handle.name] = store
+    return store
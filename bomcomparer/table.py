@@ -0,0 +1,392 @@
+"""BOM content stored column by column, and the parent/child index."""
+import sys
+import threading
+from itertools import islice
+import numpy as np
+
+from .refdes import encode_refs, clear_refs
+
+
+class Record(object):
+    """view of one row in a BOMTable.
+    Record holds no data itself, every attribute is read from the columns
+    of its table, and decoded from VOCABULARY for the encoded ones, so it
+    is cheap to create one only where it is needed.
+    """
+    __slots__ = ("table", "idx")
+
+    def __init__(self, table, idx_):
+        """constructor for Record class.
+        Inputs:
+            table: BOMTable object that stores the record.
+            idx_: the index of this record.
+        """
+        super().__init__()
+        self.table = table
+        self.idx = idx_
+
+    lvl = property(lambda self: self.table.lvl[self.idx])
+    itm = property(lambda self: VOCABULARY.values[self.table.itm[self.idx]])
+    des = property(lambda self: VOCABULARY.values[self.table.des[self.idx]])
+    qty = property(lambda self: self.table.qty[self.idx])
+    ref = property(lambda self: self.table.ref[self.idx])
+    seq = property(lambda self: self.table.seq[self.idx])
+    nme = property(lambda self: VOCABULARY.values[self.table.nme[self.idx]])
+    refs = property(lambda self: self.table.refs[self.idx])
+    children = property(lambda self: self.table.children(self.idx))
+    match = property(lambda self: self.table.match[self.idx])
+
+
+class Vocabulary(object):
+    """distinct values of string columns, each given an int32 code.
+    Values are keyed by type as well, so that 1 and 1.0 stay apart, and a
+    code decodes to the very object first encoded. Codes are not given back
+    one by one, so the vocabulary grows with every distinct string read
+    until clear drops it all at once, see reset_vocabulary. Encoding takes
+    a lock, BOMs may be read by several threads at once.
+    Besides VOCABULARY, SharedStore and BOMCache encode the object columns
+    they store with a Vocabulary of their own.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        # counts the calls of clear, codes of different generations differ
+        self.generation = 0
+        self.clear()
+
+
+    def clear(self):
+        """drop all values, codes given so far become invalid."""
+        with self.lock:
+            # (type, value) -> code, and the values by code
+            self.codes = {}
+            self.values = []
+            # values as an object array for decode, of which the first
+            # filled are set; it grows by doubling
+            self.decoded = np.empty(0, dtype="object")
+            self.filled = 0
+            self.generation += 1
+
+
+    def __len__(self):
+        return len(self.values)
+
+
+    def encode(self, values):
+        """get the codes of values, numpy array of int32."""
+        values = np.asarray(values, dtype="object").tolist()
+        with self.lock:
+            codes = self.codes
+            encoded = np.fromiter((codes.setdefault((type(x), x), len(codes)) \
+                                   for x in values), dtype="int32", \
+                                  count=len(values))
+            self.values.extend(x for _, x in \
+                               islice(codes, len(self.values), None))
+        return encoded
+
+
+    def decode(self, codes):
+        """get the values of codes, numpy array of object."""
+        if self.filled < len(self.values):
+            with self.lock:
+                size = len(self.values)
+                decoded = self.decoded
+                if len(decoded) < size:
+                    decoded = np.empty(max(size, 2*len(decoded)), \
+                                       dtype="object")
+                    decoded[:self.filled] = self.decoded[:self.filled]
+                decoded[self.filled:size] = self.values[self.filled:size]
+                self.decoded = decoded
+                self.filled = size
+        return self.decoded[codes]
+
+
+# one vocabulary for all tables of the process, so that codes of any two
+# BOMs can be compared
+VOCABULARY = Vocabulary()
+
+
+def reset_vocabulary():
+    """free VOCABULARY and the Ref Des prefixes of the process.
+    Codes, Ref Des sets and fingerprints of every BOMTable read so far
+    become invalid, so only call it once no table, TableMemo or CompareMemo
+    entry is in use and no BOM is being read, as when a long running GUI
+    clears its cache.
+    """
+    VOCABULARY.clear()
+    clear_refs()
+
+
+class BOMTable(object):
+    """BOM content stored column by column.
+    Level and Item Sequence are int32 arrays, Qty is a float64 array, and
+    Item Number, Item Series and Item Description are int32 codes into
+    VOCABULARY, so matching compares integers and strings are looked up
+    only for the report. Ref Des are interned strings. Children are kept in
+    CSR-style offset tables instead of per-row lists.
+    """
+    # all columns, the ones holding strings, and the ones stored as codes
+    fields = ("lvl", "itm", "des", "qty", "ref", "seq", "nme", "parent", \
+              "child_start", "child_indices")
+    strings = ("itm", "des", "ref", "nme")
+    encoded = ("itm", "des", "nme")
+    # columns written to the comparison report, and the ones compared
+    reported = ("lvl", "itm", "des", "qty", "ref", "seq")
+    compared = ("itm", "qty", "refs")
+
+    def __init__(self, lvl, itm, des, qty, ref, seq, nme):
+        """constructor for BOMTable class.
+        Inputs:
+            lvl, itm, des, qty, ref, seq, nme: numpy arrays from get_info.
+        """
+        super().__init__()
+        self.lvl = np.asarray(lvl, dtype="int32")
+        self.itm = VOCABULARY.encode(itm)
+        self.des = VOCABULARY.encode(des)
+        self.qty = np.asarray(qty, dtype="float64")
+        self.ref = intern_strings(ref)
+        self.seq = np.asarray(seq, dtype="int32")
+        self.nme = VOCABULARY.encode(nme)
+        self.parent, self.child_start, self.child_indices = \
+            get_family(self.lvl)
+        self.match = np.full(len(self.lvl), -1, dtype="int")
+        # dict caching index_family per sibling group, None to not cache
+        self.families = None
+        # subtree fingerprints, keyed by the columns hashed
+        self.hashes = {}
+        # Ref Des sets, parsed when first compared
+        self.ref_sets = None
+
+
+    def __len__(self):
+        return len(self.lvl)
+
+
+    def __reduce__(self):
+        # codes are only valid in this process, pickle the values instead
+        return (self.from_columns, (self.columns(),))
+
+
+    def children(self, i):
+        """get index of Record i's children, None if it has no children."""
+        start = self.child_start[i]
+        end = self.child_start[i+1]
+        if start < end:
+            return self.child_indices[start:end]
+        return None
+
+
+    def record(self, i):
+        """get a Record view of row i."""
+        return Record(self, i)
+
+
+    def column(self, name):
+        """get a column, with the values of the encoded ones."""
+        if name in self.encoded:
+            return VOCABULARY.decode(getattr(self, name))
+        return getattr(self, name)
+
+
+    def columns(self):
+        """get dict of all columns, keyed by BOMTable.fields, with the
+        values of the encoded ones."""
+        return {name: self.column(name) for name in self.fields}
+
+
+    @classmethod
+    def from_columns(cls, columns):
+        """rebuild a BOMTable from the dict given by columns(), as is.
+        Encoded columns may also be given as integer arrays of codes.
+        """
+        table = cls.__new__(cls)
+        for name in cls.fields:
+            column = columns[name]
+            if (name in cls.encoded) and (np.asarray(column).dtype.kind \
+                                          not in "iu"):
+                column = VOCABULARY.encode(column)
+            setattr(table, name, column)
+        table.match = np.full(len(table.lvl), -1, dtype="int")
+        table.families = None
+        table.hashes = {}
+        table.ref_sets = None
+        return table
+
+
+    @property
+    def refs(self):
+        """Ref Des of every Record as a set of designators, see encode_refs.
+        """
+        if self.ref_sets is None:
+            self.ref_sets = encode_refs(self.ref)
+        return self.ref_sets
+
+
+    def fingerprint(self, names=reported):
+        """get the fingerprint of every Record's subtree, see get_fingerprint.
+        Fingerprints are computed once per table and set of columns. Those
+        of BOMTable.compared leave the order of children out, since
+        children are matched by Item Series and not by position.
+        """
+        if names not in self.hashes:
+            self.hashes[names] = get_fingerprint(self, names, \
+                                                 names != self.compared)
+        return self.hashes[names]
+
+
+def encoding_figures(tables):
+    """size of VOCABULARY, and memory of the encoded columns of tables.
+    Input:
+        tables: list of BOMTable.
+    Output:
+        dict with keys vocabulary (number of distinct values), code_bytes
+        (the codes of the encoded columns), object_bytes (the same columns
+        as arrays of object) and saved_bytes.
+    """
+    code_bytes = sum(np.asarray(getattr(table, name)).nbytes \
+                     for table in tables for name in BOMTable.encoded)
+    object_bytes = sum(len(table)*np.dtype("object").itemsize \
+                       for table in tables for name in BOMTable.encoded)
+    return {"vocabulary": len(VOCABULARY), "code_bytes": code_bytes, \
+            "object_bytes": object_bytes, \
+            "saved_bytes": object_bytes-code_bytes}
+
+
+def intern_strings(values):
+    """intern strings so that equal strings share one object.
+    Input:
+        values: numpy array.
+    Output:
+        numpy array of object.
+    """
+    shared = np.empty(len(values), dtype="object")
+    shared[:] = [sys.intern(x) if type(x) is str else x for x in values]
+    return shared
+
+
+def get_family(lvl):
+    """find parent and children of all Records in one pass.
+    Input:
+        lvl: numpy array of Level.
+    Outputs:
+        parent: numpy array, index of each Record's parent, -1 if the Record
+                is not a direct child of the nearest Record above it.
+        child_start: numpy array of offsets, children of Record i are
+                     child_indices[child_start[i]:child_start[i+1]].
+        child_indices: numpy array of children index, grouped by parent in
+                       BOM order.
+    """
+    levels = np.asarray(lvl).tolist()
+    parent = np.full(len(levels), -1, dtype="int")
+
+    # the stack holds the chain of Records that may still get children
+    stack = []
+    for i, level in enumerate(levels):
+        while stack and levels[stack[-1]] >= level:
+            stack.pop()
+        if stack and levels[stack[-1]] == level-1:
+            parent[i] = stack[-1]
+        stack.append(i)
+
+    # group children by parent, stable sort keeps the BOM order
+    child = np.flatnonzero(parent >= 0)
+    child_indices = child[np.argsort(parent[child], kind="stable")]
+    child_start = np.zeros(len(levels)+1, dtype="int")
+    np.cumsum(np.bincount(parent[child], minlength=len(levels)), \
+              out=child_start[1:])
+
+    return parent, child_start, child_indices
+
+
+def mix(x):
+    """scramble the bits of numpy array x of uint64, splitmix64 finalizer."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def hash_column(values):
+    """hash every value of a column.
+    Input:
+        values: numpy array, numbers are hashed by their bits and objects
+                by the python hash.
+    Output:
+        numpy array of uint64.
+    """
+    values = np.asarray(values)
+    if values.dtype == "object":
+        hashes = np.fromiter(map(hash, values.tolist()), dtype="int64", \
+                             count=len(values))
+        return hashes.view("uint64")
+    if values.dtype.itemsize == 8:
+        return values.view("uint64")
+    return values.astype("int64").view("uint64")
+
+
+def get_fingerprint(table, names, ordered=True):
+    """hash the subtree under every Record, bottom-up in one pass.
+    The fingerprint of a Record mixes the hash of its own columns with the
+    sum of the fingerprints of its children, each mixed with its position
+    among its siblings if ordered. Two subtrees with the same fingerprint
+    hold the same rows, in the same order if ordered. Records are
+    handled level by level from the deepest, all Records of a level at once;
+    Records and children are sorted by level once, so that each level is a
+    slice of them.
+    Hashes of strings and codes of VOCABULARY change from one python
+    process to the next, so fingerprints are only comparable within one
+    process.
+    Inputs:
+        table: BOMTable object.
+        names: tuple of column names to hash, such as BOMTable.reported.
+        ordered: flag, False to leave the order of children out.
+    Output:
+        hashes: numpy array of uint64, fingerprint of each Record's subtree.
+    """
+    own = np.zeros(len(table.lvl), dtype="uint64")
+    for name in names:
+        own = mix(own + hash_column(getattr(table, name)))
+    hashes = np.zeros(len(own), dtype="uint64")
+    children = np.zeros(len(own), dtype="uint64")
+
+    # position of each child among its siblings, or 0 for all
+    child = table.child_indices
+    if ordered:
+        order = np.arange(len(child), dtype="uint64") - \
+                table.child_start[table.parent[child]].astype("uint64")
+    else:
+        order = np.zeros(len(child), dtype="uint64")
+
+    lvl = np.asarray(table.lvl)
+    by_level = np.argsort(lvl, kind="stable")
+    levels, starts = np.unique(lvl[by_level], return_index=True)
+    ends = np.append(starts[1:], len(by_level))
+    child_lvl = lvl[child]
+    child_by_level = np.argsort(child_lvl, kind="stable")
+    child_lvl = child_lvl[child_by_level]
+    child_starts = np.searchsorted(child_lvl, levels, side="left")
+    child_ends = np.searchsorted(child_lvl, levels, side="right")
+    for n in range(len(levels)-1, -1, -1):
+        rows = by_level[starts[n]:ends[n]]
+        hashes[rows] = mix(own[rows] ^ mix(children[rows]))
+        # add the fingerprints of this level into their parents
+        k = child_by_level[child_starts[n]:child_ends[n]]
+        np.add.at(children, table.parent[child[k]], \
+                  mix(hashes[child[k]] + order[k]))
+    return hashes
+
+
+def get_ancester(table1, table2):
+    """
+    Inputs:
+        table1: BOMTable of BOM1.
+        table2: BOMTable of BOM2.
+    Outputs:
+        ancester1: numpy array, index of level 1 Records in table1.
+        ancester2: numpy array, index of level 1 Records in table2.
+    """
+    ancester1 = np.flatnonzero(table1.lvl == 1)
+    ancester2 = np.flatnonzero(table2.lvl == 1)
+    return ancester1, ancester2